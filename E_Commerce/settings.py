@@ -124,6 +124,49 @@ CHANNEL_LAYERS = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+#
+# The catalog cache holds rendered public catalog responses (shop.cache).
+# Local memory is per process, so with several workers point it at Redis, e.g.
+# CATALOG_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CATALOG_CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "catalog": {
+        "BACKEND": config('CATALOG_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        "LOCATION": config('CATALOG_CACHE_LOCATION', default='catalog'),
+        "TIMEOUT": config('CATALOG_CACHE_TIMEOUT', default=600, cast=int),
+    },
+}
+
+CATALOG_CACHE_ALIAS = 'catalog'
+
+# The home page is served from a pre-rendered feed (shop.home), rebuilt on a
+# background thread after catalog changes; run rebuild_home_feed from cron to
+# refresh it on a schedule as well
+HOME_FEED_BACKGROUND = config('HOME_FEED_BACKGROUND', default=True, cast=bool)
+
+# Length of each product's precomputed related products list (shop.related).
+# Paid orders and type/category edits refresh the lists they affect; run
+# `rebuild_related_products --interval 3600` (or hourly from cron) so the
+# rest follow catalog and sales changes too
+RELATED_PRODUCTS_LIMIT = 4
+
+# "Customers also bought" engine (shop.recommendations); run
+# update_recommendations periodically to fold in newly paid orders.
+# RECOMMENDATION_METRIC is 'cosine' or 'lift'.
+RECOMMENDATION_TOP_K = 10
+RECOMMENDATION_METRIC = config('RECOMMENDATION_METRIC', default='cosine')
+RECOMMENDATION_MIN_SUPPORT = 1
+
+# Product search (shop.search). The backend is picked from the database
+# vendor unless PRODUCT_SEARCH_BACKEND names one explicitly.
+PRODUCT_SEARCH_MAX_RESULTS = 100
+
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
@@ -131,6 +174,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Set to a file path to run the multi-connection concurrency tests,
+        # which the in-memory test database cannot serve
+        'TEST': {'NAME': config('TEST_DATABASE_NAME', default=None)},
     }
 }
 
@@ -190,7 +236,7 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -199,9 +245,27 @@ EMAIL_HOST_PASSWORD = config("EMAIL_PASS")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 ADMIN_EMAIL = config("ADMIN_EMAIL")
 
+# Outbound mail is queued in the OutboundEmail table and sent by
+# `python manage.py run_mail_worker`
+MAIL_QUEUE_BATCH_SIZE = 50
+MAIL_QUEUE_MAX_ATTEMPTS = 5
+MAIL_QUEUE_RETRY_BACKOFF = 30  # seconds, doubled on every failed attempt
+
 STRIPE_PUBLIC_KEY = config('STRIPE_PUBLIC_KEY', default='pk_test_...')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='sk_test_...')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='whsec_...')
+# Handle webhook side effects (emails, subscriptions) on a background thread
+# after acknowledging Stripe. Stripe does not redeliver events that fail
+# there; run `replay_stripe_events --pending --interval 60` to retry them
+STRIPE_WEBHOOK_BACKGROUND = config('STRIPE_WEBHOOK_BACKGROUND', default=True, cast=bool)
+
+# Stripe calls go through shop.payments; point PAYMENT_GATEWAY at
+# shop.payments.FakeGateway to run checkout without network access
+PAYMENT_GATEWAY = config('PAYMENT_GATEWAY', default='shop.payments.StripeGateway')
+STRIPE_CONNECT_TIMEOUT = 5  # seconds
+STRIPE_READ_TIMEOUT = 20  # seconds
+STRIPE_MAX_NETWORK_RETRIES = 2
+STRIPE_HTTP_POOL_SIZE = 10
 
 STRIPE_SUCCESS_URL = config('STRIPE_SUCCESS_URL')
 STRIPE_CANCEL_URL = config('STRIPE_CANCEL_URL')
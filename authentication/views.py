@@ -5,7 +5,7 @@ from .serializers import RegisterSerializer, ProfileSerializer, ChangePasswordSe
 from django.contrib.auth.models import User
 from .models import EmailVerification, PasswordResetCode, Profile
 import random
-from django.core.mail import send_mail
+from shop.mail import queue_mail
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
@@ -47,11 +47,11 @@ class RegisterView(APIView):
                 code = random.randint(1000, 9999)
                 EmailVerification.objects.create(user=existing_user, code=str(code))
 
-                send_mail(
+                queue_mail(
                     "Resend Verification Code",
                     f"Your new verification code is {code}",
-                    "noreply@yourdomain.com",
                     [email],
+                    "noreply@yourdomain.com",
                 )
 
                 return Response(
@@ -74,11 +74,11 @@ class RegisterView(APIView):
             code = random.randint(1000, 9999)
             EmailVerification.objects.create(user=user, code=str(code))
 
-            send_mail(
+            queue_mail(
                 "Registration Verification Code",
                 f"Your verification code is {code}",
-                "noreply@yourdomain.com",
                 [email],
+                "noreply@yourdomain.com",
             )
 
             return Response(
@@ -190,11 +190,11 @@ class ForgetPasswordCodeSend(APIView):
 
         PasswordResetCode.objects.create(user = user, code = code)
 
-        send_mail(
+        queue_mail(
             "Password reset Code",
             f"Your password reset code is: {code}",
-            "noreply@yourdomain.com",
             [email],
+            "noreply@yourdomain.com",
         )
 
         return Response({"message": "Password reset code send successfully!"})
@@ -347,12 +347,11 @@ class SocialLogin(APIView):
         }, status=status.HTTP_200_OK)
 
     def send_account_creation_email(self, user):
-        send_mail(
+        queue_mail(
             "Welcome to Our Platform",
             f"Hi {user.username}, your account has been created successfully via social login.",
-            "noreply@yourdomain.com",
             [user.email],
-            fail_silently=True,
+            "noreply@yourdomain.com",
         )
 
     def post(self, request):
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Type, Product, ProductImage, Review, Order, OrderItem, OrderAddress, ContactMessage
+from .models import Type, Product, ProductImage, Review, Order, OrderItem, OrderAddress, ContactMessage, OutboundEmail, ProcessedStripeEvent
 
 # Register your models here.
 
@@ -40,7 +40,7 @@ class ProductImageAdmin(admin.ModelAdmin):
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
-    readonly_fields = ('product', 'price', 'quantity')
+    readonly_fields = ('product', 'product_name', 'price', 'quantity')
 
 class OrderAddressInline(admin.StackedInline):
     model = OrderAddress
@@ -61,6 +61,22 @@ class ContactMessageAdmin(admin.ModelAdmin):
     list_filter = ('sent_at',)
 
 
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject', 'last_error')
+    readonly_fields = ('attempts', 'claimed_at', 'last_error', 'sent_at')
+
+
+@admin.register(ProcessedStripeEvent)
+class ProcessedStripeEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'type', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'type', 'received_at')
+    search_fields = ('event_id', 'last_error')
+    readonly_fields = ('event_id', 'type', 'payload', 'attempts', 'last_error', 'received_at', 'claimed_at', 'processed_at')
+
+
 
 
 admin.site.site_header = "E-Commerce Admin"
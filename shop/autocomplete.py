@@ -0,0 +1,141 @@
+import sys
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from .cache import get_catalog_version
+from .models import Product, Type
+
+# In-process index for search-as-you-type. Product and type names are split
+# into words; every word is indexed by prefix (exact completion) and by
+# trigram (typo tolerance). The index is rebuilt lazily the first time it is
+# queried after the catalog version changes, so lookups never hit the database.
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return ''.join(ch if ch.isalnum() else ' ' for ch in text.lower()).split()
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex:
+    MAX_PREFIX = 12
+    MIN_SIMILARITY = 0.3
+
+    def __init__(self, entries, version=None):
+        """``entries`` is an iterable of (kind, id, label) tuples."""
+        started = time.perf_counter()
+        self.version = version
+        self.entries = []
+        self.prefixes = defaultdict(set)
+        self.trigrams = defaultdict(set)
+        self.words = {}
+        self.word_entries = defaultdict(set)
+
+        for kind, pk, label in entries:
+            entry_id = len(self.entries)
+            self.entries.append({'type': kind, 'id': pk, 'label': label})
+            for word in normalize(label):
+                word_id = self.words.setdefault(word, len(self.words))
+                self.word_entries[word_id].add(entry_id)
+                for size in range(1, min(len(word), self.MAX_PREFIX) + 1):
+                    self.prefixes[word[:size]].add(entry_id)
+                for gram in trigrams(word):
+                    self.trigrams[gram].add(word_id)
+        self.word_list = list(self.words)
+
+        self.build_time = time.perf_counter() - started
+
+    @classmethod
+    def from_catalog(cls, version=None):
+        entries = [('product', pk, name) for pk, name in Product.objects.order_by('id').values_list('pk', 'name')]
+        entries += [('type', pk, name) for pk, name in Type.objects.order_by('id').values_list('pk', 'name')]
+        return cls(entries, version=version)
+
+    def _fuzzy_entries(self, word):
+        # Trigram Jaccard similarity against every indexed word sharing a trigram
+        grams = trigrams(word)
+        shared = defaultdict(int)
+        for gram in grams:
+            for word_id in self.trigrams.get(gram, ()):
+                shared[word_id] += 1
+        scores = {}
+        for word_id, count in shared.items():
+            candidate = self.word_list[word_id]
+            # Compare against the candidate's prefix too so a typo in a
+            # partially typed word still matches
+            similarity = max(
+                count / len(grams | trigrams(candidate)),
+                count / len(grams | trigrams(candidate[:len(word) + 1])),
+            )
+            if similarity >= self.MIN_SIMILARITY:
+                for entry_id in self.word_entries[word_id]:
+                    scores[entry_id] = max(scores.get(entry_id, 0), similarity)
+        return scores
+
+    def lookup(self, query, limit=10):
+        words = normalize(query)
+        if not words:
+            return []
+
+        scores = None
+        for word in words:
+            exact = self.prefixes.get(word[:self.MAX_PREFIX], set())
+            if len(word) > self.MAX_PREFIX:
+                exact = {e for e in exact if any(w.startswith(word) for w in normalize(self.entries[e]['label']))}
+            word_scores = {entry_id: 1.0 for entry_id in exact}
+            # Typo matching only when completions alone cannot fill the page
+            if len(word) >= 3 and len(exact) < limit:
+                for entry_id, similarity in self._fuzzy_entries(word).items():
+                    word_scores.setdefault(entry_id, similarity)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {e: scores[e] + s for e, s in word_scores.items() if e in scores}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(self.entries[item[0]]['label']), item[0]))
+        return [
+            dict(self.entries[entry_id], score=round(score / len(words), 3))
+            for entry_id, score in ranked[:limit]
+        ]
+
+    def memory_footprint(self):
+        """Approximate bytes held by the index containers (shallow)."""
+        size = sys.getsizeof(self.entries) + sum(sys.getsizeof(e) for e in self.entries)
+        for mapping in (self.prefixes, self.trigrams):
+            size += sys.getsizeof(mapping)
+            size += sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in mapping.items())
+        size += sys.getsizeof(self.words) + sum(sys.getsizeof(w) for w in self.words)
+        size += sys.getsizeof(self.word_entries) + sum(sys.getsizeof(s) for s in self.word_entries.values())
+        return size
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'entries': len(self.entries),
+            'words': len(self.words),
+            'build_ms': round(self.build_time * 1000, 3),
+            'memory_bytes': self.memory_footprint(),
+        }
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_autocomplete_index():
+    global _index
+    version = get_catalog_version()
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = AutocompleteIndex.from_catalog(version=version)
+            index = _index
+    return index
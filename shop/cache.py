@@ -0,0 +1,151 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag, urlencode
+
+# Public catalog responses are cached as rendered JSON under a global catalog
+# version. Any change to a Product, ProductImage, Type or Review bumps the
+# version (see shop.signals), which orphans every cached entry at once. The
+# bump is repeated when the change commits, so nothing cached from the
+# uncommitted state outlives it.
+
+VERSION_KEY = 'catalog:version'
+HITS_KEY = 'catalog:hits'
+MISSES_KEY = 'catalog:misses'
+CACHE_HEADER = 'X-Catalog-Cache'
+
+
+def catalog_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'catalog')]
+
+
+def get_catalog_version():
+    cache = catalog_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a version key lost to eviction or a restart
+        # can never collide with entries written under an earlier version
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    cache = catalog_cache()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        return get_catalog_version()
+
+
+def invalidate_catalog():
+    # Bump now, and again on commit: a request that reads the old rows before
+    # the commit lands may cache them under the first bump
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
+
+
+def _count(key):
+    cache = catalog_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def catalog_cache_stats():
+    cache = catalog_cache()
+    return {
+        'version': get_catalog_version(),
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+def request_digest(request):
+    # Paginated responses embed absolute next/previous URLs, so the host is
+    # part of what was rendered
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return hashlib.md5(f"{request.get_host()}{request.path}?{query}".encode()).hexdigest()
+
+
+def catalog_cache_key(request, version):
+    return f"catalog:response:{version}:{request_digest(request)}"
+
+
+def catalog_etag(request, version):
+    # Strong validator: the catalog version changes whenever any catalog row does
+    return quote_etag(f"{version}-{request_digest(request)[:16]}")
+
+
+class CachedResponse(Exception):
+    """Raised from initial() to short-circuit the handler with a cached response."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class CatalogCacheMixin:
+    """Serve GET responses of public catalog views from the catalog cache.
+
+    Send ``X-Catalog-Cache: bypass`` to skip the cache while debugging; every
+    response reports HIT, MISS or BYPASS in the same header. Cached responses
+    carry an ETag, and a matching If-None-Match gets a 304 before any lookup.
+    The lookup happens after DRF's initial(), so content negotiation,
+    authentication, permissions and throttles apply to hits and 304s too.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.catalog_cache_key = None
+        bypass = (
+            request.method != 'GET'
+            or request.headers.get(CACHE_HEADER, '').lower() == 'bypass'
+            # Browsable API requests get HTML, which is never cached
+            or request.accepted_renderer.format != 'json'
+        )
+        if bypass:
+            return
+
+        version = get_catalog_version()
+        self.catalog_etag = catalog_etag(request, version)
+        not_modified = get_conditional_response(request, etag=self.catalog_etag)
+        if not_modified is not None:
+            not_modified['ETag'] = self.catalog_etag
+            raise CachedResponse(not_modified)
+
+        self.catalog_cache_key = catalog_cache_key(request, version)
+        body = catalog_cache().get(self.catalog_cache_key)
+        if body is not None:
+            _count(HITS_KEY)
+            response = HttpResponse(body, content_type='application/json')
+            response['ETag'] = self.catalog_etag
+            response[CACHE_HEADER] = 'HIT'
+            raise CachedResponse(response)
+        _count(MISSES_KEY)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, CachedResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if CACHE_HEADER in response or response.status_code == 304:
+            return response
+
+        key = getattr(self, 'catalog_cache_key', None)
+        if key is None:
+            response[CACHE_HEADER] = 'BYPASS'
+            return response
+        if response.status_code == 200 and getattr(response, 'accepted_renderer', None) is not None:
+            response.render()
+            catalog_cache().set(key, response.content)
+            response['ETag'] = self.catalog_etag
+        response[CACHE_HEADER] = 'MISS'
+        return response
@@ -0,0 +1,187 @@
+import decimal
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum, Window
+from .models import CartItem
+
+# Cart quantities are only ever changed with UPDATE ... SET quantity =
+# quantity + n, so concurrent taps on the same line add up instead of
+# overwriting each other.
+
+
+def change_quantity(line, delta, **guard):
+    """Add ``delta`` to the cart line matched by ``line`` in one UPDATE.
+
+    ``guard`` adds conditions to the UPDATE only (e.g. ``quantity__gt=1``).
+    Returns the new quantity, or None when no row matched. The row lock
+    taken by the UPDATE is held while it is read back, so the value is the
+    one this statement produced.
+    """
+    with transaction.atomic():
+        if not line.filter(**guard).update(quantity=F('quantity') + delta):
+            return None
+        return line.values_list('quantity', flat=True).first()
+
+
+def variant_lookup(field, value):
+    # Matches the unique constraint, which treats NULL and '' as the same variant
+    if value:
+        return Q(**{field: value})
+    return Q(**{f'{field}__isnull': True}) | Q(**{field: ''})
+
+
+def add_to_cart(user, product, quantity, selected_size=None, selected_color_hex=None, selected_color_name=None):
+    """Add ``quantity`` of one product variant to the cart; returns the line's new quantity."""
+    variant = {
+        'user': user,
+        'product': product,
+        'selected_size': selected_size or None,
+        'selected_color_hex': selected_color_hex or None,
+    }
+    line = CartItem.objects.filter(
+        variant_lookup('selected_size', selected_size),
+        variant_lookup('selected_color_hex', selected_color_hex),
+        user=user,
+        product=product,
+    )
+    for attempt in range(3):
+        new_quantity = change_quantity(line, quantity)
+        if new_quantity is not None:
+            return new_quantity
+        try:
+            with transaction.atomic():
+                CartItem.objects.create(quantity=quantity, selected_color_name=selected_color_name, **variant)
+            return quantity
+        except IntegrityError:
+            # A concurrent request created the line first; add to it instead
+            if attempt == 2:
+                raise
+
+
+def variant_key(product_id, selected_size, selected_color_hex):
+    return (product_id, selected_size or '', selected_color_hex or '')
+
+
+def apply_cart_operations(user, operations):
+    """Apply a batch of add/set/remove operations to a user's cart.
+
+    The batch runs in one transaction and touches the database a fixed
+    number of times however many operations it holds: one read of the
+    cart, then at most one DELETE, one bulk UPDATE and one bulk INSERT.
+    Lines that are only added to are updated with quantity = quantity + n,
+    so taps landing from other requests at the same time are kept.
+    """
+    changes = {}
+    for operation in operations:
+        key = variant_key(operation['product'].pk, operation.get('selected_size'), operation.get('selected_color_hex'))
+        change = changes.setdefault(key, {'quantity': None, 'delta': 0, 'color_name': None, 'product': operation['product']})
+        if operation['op'] == 'add':
+            change['delta'] += operation['quantity']
+        else:
+            # set and remove replace whatever came before in the batch
+            change['quantity'] = operation['quantity'] if operation['op'] == 'set' else 0
+            change['delta'] = 0
+        if operation.get('selected_color_name'):
+            change['color_name'] = operation['selected_color_name']
+
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                write_cart_changes(user, changes)
+            return
+        except IntegrityError:
+            # A concurrent request inserted one of our new lines; reread and retry
+            if attempt == 1:
+                raise
+
+
+def write_cart_changes(user, changes):
+    lines = {
+        variant_key(item.product_id, item.selected_size, item.selected_color_hex): item
+        for item in CartItem.objects.select_for_update().filter(user=user)
+    }
+
+    removed, updated, created = [], [], []
+    for key, change in changes.items():
+        item = lines.get(key)
+        if change['quantity'] is None and item is not None:
+            item.quantity = F('quantity') + change['delta']
+        else:
+            quantity = (change['quantity'] or 0) + change['delta']
+            if quantity < 1:
+                if item is not None:
+                    removed.append(item.pk)
+                continue
+            if item is None:
+                item = CartItem(
+                    user=user,
+                    product=change['product'],
+                    selected_size=key[1] or None,
+                    selected_color_hex=key[2] or None,
+                )
+                created.append(item)
+            item.quantity = quantity
+        if change['color_name']:
+            item.selected_color_name = change['color_name']
+        if item.pk is not None:
+            updated.append(item)
+
+    if removed:
+        CartItem.objects.filter(pk__in=removed).delete()
+    if updated:
+        CartItem.objects.bulk_update(updated, ['quantity', 'selected_color_name'])
+    if created:
+        CartItem.objects.bulk_create(created)
+
+
+SHIPPING_FEE = decimal.Decimal('50.00')  # Fixed shipping fee
+FREE_TSHIRT_THRESHOLD = decimal.Decimal('1500.00')
+
+
+class CartSummary:
+    """Cart lines plus the totals CartView shows and CheckoutView charges."""
+
+    def __init__(self, items, subtotal, item_count):
+        self.items = items
+        self.subtotal = decimal.Decimal(subtotal or 0).quantize(decimal.Decimal('0.01'))
+        self.item_count = item_count or 0
+        self.shipping_fee = SHIPPING_FEE
+
+    @property
+    def total(self):
+        return self.subtotal + self.shipping_fee
+
+    @property
+    def eligible_for_free_tshirt(self):
+        return self.item_count > 0 and self.subtotal >= FREE_TSHIRT_THRESHOLD
+
+    @classmethod
+    def from_lines(cls, items):
+        # For carts that never touched the database (guest checkout)
+        return cls(
+            items,
+            sum((item.product.discounted_price * item.quantity for item in items), decimal.Decimal('0')),
+            sum(item.quantity for item in items),
+        )
+
+
+def cart_summary(user, items=None):
+    """The user's cart lines, with totals computed by the database.
+
+    ``items`` is the queryset the lines are loaded from, so callers can
+    prefetch whatever their serializer needs; it defaults to the lines with
+    their products joined in. The totals are window sums over the same
+    SELECT that loads the lines, so they always describe the same cart.
+    """
+    if items is None:
+        items = CartItem.objects.select_related('product')
+    line_total = ExpressionWrapper(
+        F('quantity') * F('product__discounted_price'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    lines = list(items.filter(user=user).annotate(
+        cart_subtotal=Window(Sum(line_total)),
+        cart_item_count=Window(Sum('quantity')),
+    ).order_by('id'))
+    if not lines:
+        return CartSummary(lines, 0, 0)
+    return CartSummary(lines, lines[0].cart_subtotal, lines[0].cart_item_count)
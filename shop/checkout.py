@@ -0,0 +1,75 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from .home import schedule_home_feed_rebuild
+from .models import Order, Product
+
+# Checkout runs in two phases: the pending order is written and committed
+# first, then the Stripe Checkout Session is created outside any transaction
+# and attached in a short follow-up write. Orders whose session was never
+# attached are released here, either straight away when Stripe fails or later
+# by the reconcile_checkouts command.
+
+
+def adjust_order_counts(quantities):
+    # One UPDATE ... SET order_count = order_count + CASE ... for every
+    # product; the database applies the deltas, so concurrent checkouts
+    # cannot overwrite each other's counts
+    if not quantities:
+        return
+    Product.objects.filter(pk__in=quantities).update(
+        order_count=F('order_count') + Case(
+            *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+    # update() sends no signals. Only the home feed sorts by order_count, so
+    # it alone is rebuilt; the versioned catalog cache is left alone rather
+    # than emptied on every checkout, and the order_count its cached product
+    # payloads show may lag by up to the cache TIMEOUT.
+    schedule_home_feed_rebuild()
+
+
+def increment_order_counts(cart_items):
+    quantities = defaultdict(int)
+    for item in cart_items:
+        quantities[item.product.pk] += item.quantity
+    adjust_order_counts(quantities)
+
+
+def release_order(order, delete=False):
+    """Undo a checkout that never reached Stripe: give back its order counts
+    and either delete the order or mark it cancelled."""
+    with transaction.atomic():
+        quantities = defaultdict(int)
+        for product_id, quantity in order.items.filter(is_free_item=False, product__isnull=False).values_list('product_id', 'quantity'):
+            quantities[product_id] -= quantity
+        adjust_order_counts(quantities)
+
+        if delete:
+            order.delete()
+        else:
+            Order.objects.filter(pk=order.pk).update(status='Cancelled', updated_at=timezone.now())
+
+
+def unattached_orders(older_than):
+    # Pending orders that never got a Stripe Checkout Session attached
+    return Order.objects.filter(
+        status='Pending',
+        is_paid=False,
+        stripe_checkout_session_id__isnull=True,
+        created_at__lt=timezone.now() - older_than,
+    )
+
+
+def reconcile_unattached_orders(older_than=timedelta(minutes=30)):
+    released = 0
+    for order in unattached_orders(older_than):
+        # Cancel rather than delete: a session may exist on Stripe's side,
+        # and a late payment webhook can still find and revive the order
+        release_order(order, delete=False)
+        released += 1
+    return released
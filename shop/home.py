@@ -0,0 +1,87 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+from .cache import catalog_cache
+from .models import Product, Review
+from .serializers import ProductListSerializer, ReviewSerializer
+
+# The landing page is served from a HomeFeed snapshot: the rendered JSON
+# body plus its ETag, kept in the catalog cache under a fixed key so catalog
+# version bumps do not orphan it. Requests only read the snapshot. It is
+# rebuilt by the rebuild_home_feed command and, after commit, whenever
+# something on the page may have changed (see shop.signals); until the
+# rebuild lands the previous snapshot keeps being served. Rebuilds only
+# reach the cache of the process that ran them, so the snapshot still
+# expires after the catalog cache's TIMEOUT: with the default per-process
+# LocMemCache that bounds how long other workers serve a stale page.
+
+FEED_KEY = 'home:feed'
+PRODUCT_LIMIT = 4
+REVIEW_LIMIT = 20
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='home-feed')
+_lock = threading.Lock()
+_queued = False
+
+
+def render_home_feed():
+    products = Product.objects.for_listing().order_by('-order_count', '-created_at')[:PRODUCT_LIMIT]
+    reviews = Review.objects.select_related('user_name').order_by('-rating')[:REVIEW_LIMIT]
+    body = JSONRenderer().render({
+        'products': ProductListSerializer(products, many=True).data,
+        'reviews': ReviewSerializer(reviews, many=True).data,
+    })
+    return {
+        'body': body,
+        'etag': quote_etag(hashlib.md5(body).hexdigest()),
+        'built_at': timezone.now().isoformat(),
+    }
+
+
+def rebuild_home_feed():
+    feed = render_home_feed()
+    catalog_cache().set(FEED_KEY, feed)
+    return feed
+
+
+def get_home_feed():
+    """Return (feed, cached). Only a cold cache builds the feed in the request."""
+    feed = catalog_cache().get(FEED_KEY)
+    if feed is not None:
+        return feed, True
+    return rebuild_home_feed(), False
+
+
+def _rebuild_in_background():
+    global _queued
+    # Clear the flag before reading, so changes committed during the
+    # rebuild queue another one
+    with _lock:
+        _queued = False
+    try:
+        rebuild_home_feed()
+    finally:
+        close_old_connections()
+
+
+def request_home_feed_rebuild():
+    global _queued
+    if not getattr(settings, 'HOME_FEED_BACKGROUND', True):
+        rebuild_home_feed()
+        return
+    # A burst of changes (an admin bulk edit, a busy checkout minute)
+    # collapses into one pending rebuild
+    with _lock:
+        if _queued:
+            return
+        _queued = True
+    _executor.submit(_rebuild_in_background)
+
+
+def schedule_home_feed_rebuild():
+    transaction.on_commit(request_home_feed_rebuild)
@@ -0,0 +1,127 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import OutboundEmail
+
+# Outbound mail goes through the OutboundEmail table instead of talking to
+# SMTP inside the request. queue_mail() writes the row once the surrounding
+# transaction commits, and the run_mail_worker command drains due rows in
+# batches over long-lived SMTP connections, retrying failures with
+# exponential backoff.
+
+MAX_BACKOFF = timedelta(hours=1)
+
+
+def queue_mail(subject, body, recipients, from_email=None):
+    message = OutboundEmail(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+    # Nothing is queued for a registration or order that is rolled back
+    transaction.on_commit(message.save)
+    return message
+
+
+def retry_delay(attempts):
+    backoff = getattr(settings, 'MAIL_QUEUE_RETRY_BACKOFF', 30)
+    return min(timedelta(seconds=backoff * 2 ** (attempts - 1)), MAX_BACKOFF)
+
+
+class MailWorker:
+    def __init__(self, batch_size=None, threads=1, max_attempts=None, lease=timedelta(minutes=10)):
+        self.batch_size = batch_size or getattr(settings, 'MAIL_QUEUE_BATCH_SIZE', 50)
+        self.max_attempts = max_attempts or getattr(settings, 'MAIL_QUEUE_MAX_ATTEMPTS', 5)
+        # Rows left in Sending longer than this belong to a worker that died
+        self.lease = lease
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='mail-worker')
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def claim(self):
+        now = timezone.now()
+        due = Q(status='Queued', next_attempt_at__lte=now) | Q(status='Sending', claimed_at__lt=now - self.lease)
+        with transaction.atomic():
+            queryset = OutboundEmail.objects.filter(due).order_by('next_attempt_at', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+            batch = list(queryset[:self.batch_size])
+            OutboundEmail.objects.filter(pk__in=[m.pk for m in batch]).update(status='Sending', claimed_at=now)
+        return batch
+
+    def get_connection(self):
+        # Every pool thread keeps one SMTP connection open across batches
+        mail_connection = getattr(self._local, 'connection', None)
+        if mail_connection is None:
+            mail_connection = get_connection()
+            mail_connection.open()
+            self._local.connection = mail_connection
+            with self._lock:
+                self._connections.append(mail_connection)
+        return mail_connection
+
+    def drop_connection(self):
+        mail_connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if mail_connection is not None:
+            with self._lock:
+                self._connections.remove(mail_connection)
+            try:
+                mail_connection.close()
+            except Exception:
+                pass
+
+    def send(self, message):
+        email = EmailMessage(message.subject, message.body, message.from_email, message.recipients)
+        try:
+            self.get_connection().send_messages([email])
+        except Exception as e:
+            # The connection may be half-open; the next message reconnects
+            self.drop_connection()
+            return message, e
+        return message, None
+
+    def record(self, results):
+        now = timezone.now()
+        sent = [message.pk for message, error in results if error is None]
+        OutboundEmail.objects.filter(pk__in=sent).update(status='Sent', sent_at=now, claimed_at=None, last_error='')
+
+        failed = []
+        for message, error in results:
+            if error is None:
+                continue
+            message.attempts += 1
+            message.last_error = str(error)
+            message.claimed_at = None
+            if message.attempts >= self.max_attempts:
+                message.status = 'Failed'
+            else:
+                message.status = 'Queued'
+                message.next_attempt_at = now + retry_delay(message.attempts)
+            failed.append(message)
+        OutboundEmail.objects.bulk_update(
+            failed, ['attempts', 'last_error', 'claimed_at', 'status', 'next_attempt_at']
+        )
+        return len(sent), len(failed)
+
+    def run_once(self):
+        batch = self.claim()
+        if not batch:
+            return 0, 0
+        return self.record(list(self.pool.map(self.send, batch)))
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        for mail_connection in self._connections:
+            try:
+                mail_connection.close()
+            except Exception:
+                pass
+        self._connections = []
@@ -0,0 +1,68 @@
+import random
+from itertools import accumulate
+import time
+from django.core.management.base import BaseCommand
+from shop.recommendations import CoPurchaseMatrix
+
+
+class Command(BaseCommand):
+    help = "Time the co-purchase engine on synthetic order histories (no database access)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[10_000, 100_000, 1_000_000], help="Order line counts to benchmark")
+        parser.add_argument('--products', type=int, default=5000, help="Catalog size")
+        parser.add_argument('--basket-size', type=int, default=3, help="Average lines per order")
+        parser.add_argument('--metric', choices=['cosine', 'lift'], default='cosine')
+        parser.add_argument('--top-k', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def synthetic_baskets(self, lines, products, basket_size, rng):
+        # Zipf-like popularity, so a few products dominate as in real shops
+        cum_weights = list(accumulate(1 / (rank + 1) for rank in range(products)))
+        catalog = list(range(1, products + 1))
+        baskets, produced = [], 0
+        while produced < lines:
+            size = min(max(1, int(rng.expovariate(1 / basket_size)) + 1), lines - produced)
+            produced += size
+            baskets.append(rng.choices(catalog, cum_weights=cum_weights, k=size))
+        return baskets
+
+    def handle(self, *args, **options):
+        header = f"{'lines':>10} {'orders':>9} {'products':>9} {'pairs':>10} {'build s':>8} {'top-k s':>8} {'save s':>8} {'load s':>8} {'update s':>9} {'MB':>7}"
+        self.stdout.write(header)
+        for lines in options['lines']:
+            rng = random.Random(options['seed'])
+            history = self.synthetic_baskets(lines, options['products'], options['basket_size'], rng)
+            new_orders = self.synthetic_baskets(100 * options['basket_size'], options['products'], options['basket_size'], rng)
+            matrix = CoPurchaseMatrix()
+
+            started = time.perf_counter()
+            for basket in history:
+                matrix.add_basket(basket)
+            build = time.perf_counter() - started
+
+            started = time.perf_counter()
+            matrix.top_k(options['top_k'], options['metric'])
+            top_k = time.perf_counter() - started
+
+            started = time.perf_counter()
+            blob = matrix.to_bytes()
+            save = time.perf_counter() - started
+
+            started = time.perf_counter()
+            matrix = CoPurchaseMatrix.from_bytes(blob)
+            load = time.perf_counter() - started
+
+            # An incremental run: about 100 new orders, re-ranking only what they touch
+            started = time.perf_counter()
+            touched = set()
+            for basket in new_orders:
+                touched.update(matrix.add_basket(basket))
+            matrix.top_k(options['top_k'], options['metric'], rows=matrix.affected_rows(touched))
+            update = time.perf_counter() - started
+
+            pairs = sum(len(row) for row in matrix.rows) // 2
+            self.stdout.write(
+                f"{lines:>10} {matrix.baskets:>9} {len(matrix):>9} {pairs:>10} {build:>8.2f} {top_k:>8.2f} "
+                f"{save:>8.2f} {load:>8.2f} {update:>9.3f} {len(blob) / 1e6:>7.2f}"
+            )
@@ -0,0 +1,14 @@
+from shop.home import rebuild_home_feed
+from shop.management.periodic import PeriodicCommand
+
+
+class Command(PeriodicCommand):
+    help = "Rebuild the pre-rendered home page feed in the catalog cache"
+    interval_help = "Keep running and rebuild every N seconds"
+
+    def handle(self, *args, **options):
+        self.run_periodically(self.rebuild, options['interval'])
+
+    def rebuild(self):
+        feed = rebuild_home_feed()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt home feed ({len(feed['body'])} bytes)"))
@@ -0,0 +1,25 @@
+from django.core.management.base import CommandError
+from shop.management.periodic import PeriodicCommand
+from shop.related import rebuild_related_products, refresh_related_products
+
+
+class Command(PeriodicCommand):
+    help = "Recompute the precomputed related products from paid orders and catalog similarity"
+    interval_help = "Keep running and rebuild every N seconds"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('product_ids', nargs='*', type=int, help="Only recompute these products")
+
+    def handle(self, *args, **options):
+        if options['product_ids']:
+            if options['interval'] is not None:
+                raise CommandError("--interval rebuilds every product; drop the product ids")
+            written = refresh_related_products(options['product_ids'])
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} related product entries"))
+            return
+        self.run_periodically(self.rebuild, options['interval'])
+
+    def rebuild(self):
+        written = rebuild_related_products()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} related product entries"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from shop.models import ProductRatingSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized product rating summaries from the Review table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', type=int, help="Only rebuild these products")
+
+    def handle(self, *args, **options):
+        product_ids = options['product_ids'] or None
+        with transaction.atomic():
+            rebuilt = ProductRatingSummary.rebuild(product_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating summaries for {rebuilt} products"))
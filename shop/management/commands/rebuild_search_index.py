@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from shop.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product full-text search index from the Product table"
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt product search index with {type(backend).__name__}"))
@@ -0,0 +1,17 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from shop.checkout import reconcile_unattached_orders
+
+
+class Command(BaseCommand):
+    help = "Cancel pending orders whose Stripe Checkout Session was never attached"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=30,
+            help="Only touch orders created more than this many minutes ago (default 30)",
+        )
+
+    def handle(self, *args, **options):
+        released = reconcile_unattached_orders(timedelta(minutes=options['older_than']))
+        self.stdout.write(self.style.SUCCESS(f"Released {released} unattached orders"))
@@ -0,0 +1,64 @@
+import json
+from django.conf import settings
+from django.core.management.base import CommandError
+from shop.management.periodic import PeriodicCommand
+from shop.models import ProcessedStripeEvent
+from shop.webhooks import event_id_for, pending_events, process_event, record_event
+
+
+class Command(PeriodicCommand):
+    help = "Process Stripe events from a JSON fixture, or stored events that were never handled"
+    interval_help = "With --pending, keep running and retry pending events every N seconds"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('fixture', nargs='?', help="JSON file holding one Stripe event or a list of them")
+        parser.add_argument('--pending', action='store_true', help="Also process stored events that are Received, Failed or abandoned mid-run")
+        parser.add_argument('--force', action='store_true', help="Reprocess fixture events that were already handled")
+
+    def handle(self, *args, **options):
+        if not options['fixture'] and not options['pending']:
+            raise CommandError("Give a fixture file, --pending, or both")
+        if options['interval'] is not None and not options['pending']:
+            raise CommandError("--interval needs --pending")
+
+        fixture_ids = self.record_fixture(options['fixture'], options['force']) if options['fixture'] else []
+        # Unattended runs give up on events that keep failing; they stay
+        # Failed for a manual replay
+        max_attempts = None
+        if options['interval'] is not None:
+            max_attempts = getattr(settings, 'STRIPE_EVENT_MAX_ATTEMPTS', 5)
+
+        def process():
+            event_ids = list(fixture_ids)
+            # Fixture events only go through on the first pass
+            fixture_ids.clear()
+            if options['pending']:
+                event_ids.extend(
+                    pk for pk in pending_events(max_attempts).values_list('pk', flat=True) if pk not in event_ids
+                )
+            processed = sum(1 for event_id in event_ids if process_event(event_id))
+            failed = ProcessedStripeEvent.objects.filter(pk__in=event_ids, status='Failed').count()
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} events, {failed} failed"))
+
+        self.run_periodically(process, options['interval'])
+
+    def record_fixture(self, path, force):
+        try:
+            with open(path) as f:
+                events = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+        if isinstance(events, dict):
+            events = [events]
+
+        event_ids = []
+        for event in events:
+            record = record_event(event)
+            if record is not None:
+                event_ids.append(record.event_id)
+            elif force:
+                event_id = event_id_for(event)
+                ProcessedStripeEvent.objects.filter(pk=event_id).update(status='Received', payload=event)
+                event_ids.append(event_id)
+        return event_ids
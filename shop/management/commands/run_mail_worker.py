@@ -0,0 +1,31 @@
+from shop.mail import MailWorker
+from shop.management.periodic import PeriodicCommand
+
+
+class Command(PeriodicCommand):
+    help = "Send queued outbound emails in batches, retrying failures with backoff"
+    default_interval = 5
+    interval_help = "Seconds to wait when the queue is empty"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=None, help="Messages claimed per batch")
+        parser.add_argument('--threads', type=int, default=1, help="Sender threads, each with its own SMTP connection")
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit")
+
+    def handle(self, *args, **options):
+        worker = MailWorker(batch_size=options['batch_size'], threads=options['threads'])
+        totals = {'sent': 0, 'failed': 0}
+
+        def send_batch():
+            sent, failed = worker.run_once()
+            totals['sent'] += sent
+            totals['failed'] += failed
+            # A busy queue is drained without waiting between batches
+            return sent or failed
+
+        try:
+            self.run_periodically(send_batch, None if options['once'] else options['interval'])
+        finally:
+            worker.close()
+        self.stdout.write(self.style.SUCCESS(f"Sent {totals['sent']} emails, {totals['failed']} failed"))
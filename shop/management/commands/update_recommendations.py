@@ -0,0 +1,27 @@
+import time
+from shop.management.periodic import PeriodicCommand
+from shop.recommendations import rebuild_recommendations, update_recommendations
+
+
+class Command(PeriodicCommand):
+    help = "Fold newly paid orders into the co-purchase recommendations, or rebuild them from scratch"
+    interval_help = "Keep running and update every N seconds"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--full', action='store_true', help="Rebuild from every paid order")
+
+    def handle(self, *args, **options):
+        if options['full']:
+            started = time.perf_counter()
+            matrix = rebuild_recommendations()
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt recommendations for {len(matrix)} products from {matrix.baskets} orders "
+                f"in {time.perf_counter() - started:.2f}s"
+            ))
+            return
+        self.run_periodically(self.update, options['interval'])
+
+    def update(self):
+        added = update_recommendations()
+        self.stdout.write(self.style.SUCCESS(f"Added {added} orders to the recommendations"))
@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class PeriodicCommand(BaseCommand):
+    """A command that does its work once, or keeps repeating it with --interval."""
+
+    default_interval = None
+    interval_help = "Keep running and repeat every N seconds"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=self.default_interval, help=self.interval_help)
+
+    def run_periodically(self, work, interval):
+        """Call ``work`` once, or every ``interval`` seconds until interrupted.
+
+        When ``work`` returns a true value there may be more to do straight
+        away, so it is called again without waiting; with no interval that
+        repeats until it returns a false value.
+        """
+        try:
+            while True:
+                if work():
+                    continue
+                if interval is None:
+                    break
+                # Drop connections the database may close while we sleep
+                close_old_connections()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-18 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_summaries(apps, schema_editor):
+    Product = apps.get_model('shop', 'Product')
+    Review = apps.get_model('shop', 'Review')
+    ProductRatingSummary = apps.get_model('shop', 'ProductRatingSummary')
+
+    rows = Review.objects.values('product').annotate(
+        review_count=models.Count('id'),
+        rating_sum=models.Sum('rating'),
+        **{f'star_{n}': models.Count('id', filter=models.Q(rating=n)) for n in range(6)},
+    ).order_by()
+    stats = {row.pop('product'): row for row in rows}
+
+    ProductRatingSummary.objects.bulk_create([
+        ProductRatingSummary(product_id=product_id, **stats.get(product_id, {}))
+        for product_id in Product.objects.values_list('pk', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0027_merge_0026'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRatingSummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='shop.product')),
+                ('review_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('star_0', models.IntegerField(default=0)),
+                ('star_1', models.IntegerField(default=0)),
+                ('star_2', models.IntegerField(default=0)),
+                ('star_3', models.IntegerField(default=0)),
+                ('star_4', models.IntegerField(default=0)),
+                ('star_5', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
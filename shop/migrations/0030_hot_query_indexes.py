@@ -0,0 +1,84 @@
+# Generated by Django 6.0 on 2026-10-18 10:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remove_duplicates(apps, schema_editor):
+    # The new unique constraints would fail on rows that already break them
+    Review = apps.get_model('shop', 'Review')
+    CartItem = apps.get_model('shop', 'CartItem')
+    ProductRatingSummary = apps.get_model('shop', 'ProductRatingSummary')
+
+    kept_reviews = set()
+    affected_products = set()
+    for review in Review.objects.order_by('-created_at', '-id'):
+        key = (review.user_name_id, review.product_id)
+        if key in kept_reviews:
+            affected_products.add(review.product_id)
+            review.delete()
+        else:
+            kept_reviews.add(key)
+
+    for product_id in affected_products:
+        rows = Review.objects.filter(product_id=product_id).aggregate(
+            review_count=models.Count('id'),
+            rating_sum=models.Sum('rating'),
+            **{f'star_{n}': models.Count('id', filter=models.Q(rating=n)) for n in range(6)},
+        )
+        rows['rating_sum'] = rows['rating_sum'] or 0
+        ProductRatingSummary.objects.update_or_create(product_id=product_id, defaults=rows)
+
+    kept_items = {}
+    for item in CartItem.objects.order_by('added_at', 'id'):
+        key = (item.user_id, item.product_id, item.selected_size, item.selected_color_hex)
+        if None in key:
+            # NULLs never collide in a unique constraint
+            continue
+        if key in kept_items:
+            kept = kept_items[key]
+            kept.quantity += item.quantity
+            kept.save(update_fields=['quantity'])
+            item.delete()
+        else:
+            kept_items[key] = item
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0029_order_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='shop_order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['stripe_checkout_session_id'], name='shop_order_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'id'], name='shop_product_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-order_count', '-created_at'], name='shop_product_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stripe_subscription_price_id'], name='shop_product_sub_price_idx'),
+        ),
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('user', 'product', 'selected_size', 'selected_color_hex'), name='shop_cartitem_unique_variant'),
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('user_name', 'product'), name='shop_review_unique_user_product'),
+        ),
+    ]
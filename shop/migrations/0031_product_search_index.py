@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-18 10:30
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS shop_product_fts "
+            "USING fts5(name, description, type_name, category, tokenize='unicode61', prefix='2 3')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS shop_product_search ("
+            "product_id bigint PRIMARY KEY REFERENCES shop_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS shop_product_search_document_idx ON shop_product_search USING GIN (document)"
+        )
+    else:
+        return
+
+    Product = apps.get_model('shop', 'Product')
+    with schema_editor.connection.cursor() as cursor:
+        for product in Product.objects.select_related('type').iterator():
+            type_name = product.type.name if product.type_id else ''
+            if vendor == 'sqlite':
+                cursor.execute(
+                    "INSERT INTO shop_product_fts (rowid, name, description, type_name, category) VALUES (%s, %s, %s, %s, %s)",
+                    [product.pk, product.name, product.description or '', type_name, product.category],
+                )
+            else:
+                cursor.execute(
+                    "INSERT INTO shop_product_search (product_id, document) VALUES (%s, "
+                    "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+                    "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'C'))",
+                    [product.pk, product.name, type_name, product.category, product.description or ''],
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS shop_product_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS shop_product_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0030_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0032_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedStripeEvent',
+            fields=[
+                ('event_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('type', models.CharField(max_length=100)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('Received', 'Received'), ('Processing', 'Processing'), ('Processed', 'Processed'), ('Failed', 'Failed')], default='Received', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 14:20
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    # 0030 skipped lines without a size or colour; merge those now
+    CartItem = apps.get_model('shop', 'CartItem')
+    kept_items = {}
+    for item in CartItem.objects.exclude(user=None).order_by('added_at', 'id'):
+        key = (item.user_id, item.product_id, item.selected_size or '', item.selected_color_hex or '')
+        if key in kept_items:
+            kept = kept_items[key]
+            kept.quantity += item.quantity
+            kept.save(update_fields=['quantity'])
+            item.delete()
+        else:
+            kept_items[key] = item
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0033_processedstripeevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='cartitem',
+            name='shop_cartitem_unique_variant',
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(models.F('user'), models.F('product'), django.db.models.functions.comparison.Coalesce('selected_size', models.Value('')), django.db.models.functions.comparison.Coalesce('selected_color_hex', models.Value('')), name='shop_cartitem_unique_variant'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0034_cartitem_unique_variant_nulls'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='shop_order_user_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='shop_order_user_created_idx'),
+        ),
+    ]
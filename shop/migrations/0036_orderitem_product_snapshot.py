@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-18 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def snapshot_order_items(apps, schema_editor):
+    # Freeze name and image for lines written before the snapshot fields existed
+    OrderItem = apps.get_model('shop', 'OrderItem')
+    ProductImage = apps.get_model('shop', 'ProductImage')
+
+    first_images = {}
+    for product_id, image in ProductImage.objects.order_by('-id').values_list('product_id', 'image'):
+        first_images[product_id] = image
+
+    items = list(OrderItem.objects.select_related('product').filter(product_name=''))
+    for item in items:
+        if item.product is not None:
+            item.product_name = item.product.name
+            item.product_image = first_images.get(item.product_id) or item.product.logo.name or ''
+        elif item.is_free_item:
+            item.product_name = 'Free T-shirt'
+    OrderItem.objects.bulk_update(items, ['product_name', 'product_image'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0035_order_history_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_image',
+            field=models.CharField(blank=True, default='', help_text='Storage name of the product image at checkout', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='shop.product'),
+        ),
+        migrations.RunPython(snapshot_order_items, migrations.RunPython.noop),
+    ]
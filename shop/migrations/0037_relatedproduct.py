@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 16:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0036_orderitem_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('co_purchases', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='shop.product')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-score'], name='shop_related_product_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'related'), name='shop_relatedproduct_unique_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 17:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0037_relatedproduct'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='recommendations_indexed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_paid', True), ('recommendations_indexed', False)), fields=['id'], name='shop_order_unindexed_idx'),
+        ),
+        migrations.CreateModel(
+            name='RecommendationState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matrix', models.BinaryField()),
+                ('baskets', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('co_purchases', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='shop.product')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-score'], name='shop_recommendation_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'recommended'), name='shop_recommendation_unique_pair')],
+            },
+        ),
+    ]
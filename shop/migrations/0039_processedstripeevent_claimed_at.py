@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0038_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedstripeevent',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
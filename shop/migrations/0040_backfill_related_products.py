@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 19:20
+
+from django.db import migrations
+
+
+def backfill_related_products(apps, schema_editor):
+    # Without this every existing product page shows no related products
+    # until rebuild_related_products is run by hand
+    from shop.related import compute_related
+
+    Product = apps.get_model('shop', 'Product')
+    RelatedProduct = apps.get_model('shop', 'RelatedProduct')
+
+    product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(product_ids), 500):
+        batch = product_ids[start:start + 500]
+        RelatedProduct.objects.filter(product_id__in=batch).delete()
+        RelatedProduct.objects.bulk_create(compute_related(batch, apps))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0039_processedstripeevent_claimed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_related_products, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 # Create your models here.
 
@@ -24,6 +27,27 @@ class Type(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        # Everything ProductListSerializer touches, loaded in a fixed number of queries
+        return self.select_related('type', 'rating_summary').prefetch_related(
+            models.Prefetch('images', queryset=ProductImage.objects.order_by('id')),
+        )
+
+    def for_detail(self):
+        # Everything ProductSerializer touches, including full review bodies
+        return self.select_related('type').prefetch_related(
+            models.Prefetch('images', queryset=ProductImage.objects.order_by('id')),
+            models.Prefetch('reviews', queryset=Review.objects.select_related('user_name').order_by('id')),
+        )
+
+    def with_primary_image(self):
+        # Name of the first gallery image, without loading the gallery
+        return self.annotate(primary_image=models.Subquery(
+            ProductImage.objects.filter(product=models.OuterRef('pk')).order_by('id').values('image')[:1]
+        ))
     
 
 class Product(models.Model):
@@ -46,6 +70,18 @@ class Product(models.Model):
     stripe_one_time_price_id = models.CharField(max_length=100, blank=True, null=True)
     stripe_subscription_price_id = models.CharField(max_length=100, blank=True, null=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Category listings are paginated in id order
+            models.Index(fields=['category', 'id'], name='shop_product_category_idx'),
+            # Home page "popular products"
+            models.Index(fields=['-order_count', '-created_at'], name='shop_product_popular_idx'),
+            # Stripe webhook price -> product lookup
+            models.Index(fields=['stripe_subscription_price_id'], name='shop_product_sub_price_idx'),
+        ]
+
     def __str__(self):
         return self.name
     
@@ -65,11 +101,134 @@ class Review(models.Model):
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_name', 'product'], name='shop_review_unique_user_product'),
+        ]
+
     def __str__(self):
         return f"Review by {self.user_name} for {self.product.name}"
+
+
+class ProductRatingSummary(models.Model):
+    # Denormalized review aggregates, kept in step with Review by shop.signals
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    star_0 = models.IntegerField(default=0)
+    star_1 = models.IntegerField(default=0)
+    star_2 = models.IntegerField(default=0)
+    star_3 = models.IntegerField(default=0)
+    star_4 = models.IntegerField(default=0)
+    star_5 = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Rating summary for product {self.product_id}"
+
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return 0
+        return round(self.rating_sum / self.review_count, 1)
+
+    @classmethod
+    def apply_review(cls, product_id, rating, delta=1):
+        # Single UPDATE with F() expressions so concurrent reviews never lose counts
+        if delta > 0:
+            cls.objects.get_or_create(product_id=product_id)
+        cls.objects.filter(product_id=product_id).update(
+            review_count=models.F('review_count') + delta,
+            rating_sum=models.F('rating_sum') + delta * rating,
+            **{f'star_{rating}': models.F(f'star_{rating}') + delta},
+        )
+
+    @classmethod
+    def rebuild(cls, product_ids=None):
+        products = Product.objects.all()
+        if product_ids is not None:
+            products = products.filter(pk__in=product_ids)
+
+        from .reviews import star_count_aggregates
+
+        rows = Review.objects.filter(product__in=products).values('product').annotate(
+            review_count=models.Count('id'),
+            rating_sum=models.Sum('rating'),
+            **star_count_aggregates(),
+        ).order_by()
+        stats = {row.pop('product'): row for row in rows}
+
+        summaries = [
+            cls(product_id=product_id, **stats.get(product_id, {}))
+            for product_id in products.values_list('pk', flat=True)
+        ]
+        cls.objects.filter(product__in=products).delete()
+        cls.objects.bulk_create(summaries)
+        return len(summaries)
     
 
 
+class RelatedProduct(models.Model):
+    """Precomputed "related products" list; see shop.related."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    co_purchases = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'related'], name='shop_relatedproduct_unique_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['product', '-score'], name='shop_related_product_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.related_id} related to {self.product_id} ({self.score:.2f})"
+
+
+class ProductRecommendation(models.Model):
+    """Neighbours for "Customers also bought", from the co-purchase engine; see shop.recommendations."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    co_purchases = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'recommended'], name='shop_recommendation_unique_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['product', '-score'], name='shop_recommendation_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recommended_id} for {self.product_id} ({self.score:.3f})"
+
+
+class RecommendationState(models.Model):
+    # Single row (pk 1, see shop.recommendations): the serialized co-purchase
+    # matrix, kept so new orders can be folded in without rescanning the
+    # order history. An empty matrix means no build has run yet.
+    matrix = models.BinaryField()
+    baskets = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Co-purchase matrix over {self.baskets} orders"
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_products(self):
+        # Everything CartItemSerializer touches
+        return self.prefetch_related(models.Prefetch('product', queryset=Product.objects.with_primary_image()))
+
+    def with_product_details(self):
+        # Everything CartItemExpandedSerializer touches
+        return self.prefetch_related(models.Prefetch('product', queryset=Product.objects.for_detail()))
+
+
 class CartItem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cart_items', blank=True, null=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -79,11 +238,38 @@ class CartItem(models.Model):
     selected_color_name = models.CharField(max_length=50, blank=True, null=True)
     added_at = models.DateTimeField(auto_now_add=True, blank=True, null=True)
 
+    objects = CartItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Coalesce so lines without a size or colour are unique too;
+            # NULLs never collide in a plain unique constraint
+            models.UniqueConstraint(
+                'user', 'product', Coalesce('selected_size', Value('')), Coalesce('selected_color_hex', Value('')),
+                name='shop_cartitem_unique_variant',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.quantity} of {self.product.name}"
     
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        # Everything OrderSerializer touches; lines carry their own product
+        # snapshot, so the catalog tables are never read
+        return self.select_related('orderaddress').prefetch_related(
+            models.Prefetch('items', queryset=OrderItem.objects.order_by('id')),
+        )
+
+    def for_summary(self):
+        # Everything OrderSummarySerializer touches
+        return self.prefetch_related(
+            models.Prefetch('items', queryset=OrderItem.objects.order_by('id')),
+        )
+
+
 class Order(models.Model):
     ORDER_STATUS_CHOICES = [
         ('Pending', 'Pending'),
@@ -100,7 +286,25 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES, default='Pending')
     is_paid = models.BooleanField(default=False)
     stripe_checkout_session_id = models.CharField(max_length=255, blank=True, null=True)
+    # Set once the paid order's basket is folded into the co-purchase matrix (shop.recommendations)
+    recommendations_indexed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Order history, newest first; id breaks ties for cursor pagination
+            models.Index(fields=['user', '-created_at', '-id'], name='shop_order_user_created_idx'),
+            models.Index(fields=['stripe_checkout_session_id'], name='shop_order_session_idx'),
+            # Paid orders still waiting for the recommendations update
+            models.Index(
+                fields=['id'],
+                condition=models.Q(is_paid=True, recommendations_indexed=False),
+                name='shop_order_unindexed_idx',
+            ),
+        ]
 
     def __str__(self):
         user_display = self.user.username if self.user else "Guest"
@@ -109,7 +313,10 @@ class Order(models.Model):
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
-    product = models.ForeignKey(Product, on_delete=models.CASCADE, blank=True, null=True)
+    # Kept for reporting only; the snapshot fields below are what the order shows
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, blank=True, null=True)
+    product_name = models.CharField(max_length=100, blank=True, default='')
+    product_image = models.CharField(max_length=255, blank=True, default='', help_text="Storage name of the product image at checkout")
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.IntegerField(default=1)
     ordered_size = models.CharField(max_length=3, blank=True, null=True)
@@ -121,7 +328,23 @@ class OrderItem(models.Model):
     def __str__(self):
         if self.is_free_item:
             return f"Free T-shirt ({self.free_item_size}) in Order {self.order.id}"
-        return f"{self.quantity} x {self.product.name} in Order {self.order.id}"
+        return f"{self.quantity} x {self.product_name} in Order {self.order.id}"
+
+    @classmethod
+    def from_product(cls, order, product, quantity, size=None, color_hex=None, color_name=None):
+        # Freeze what the customer bought; pass products from
+        # Product.objects.with_primary_image() to capture the gallery image
+        return cls(
+            order=order,
+            product=product,
+            product_name=product.name,
+            product_image=getattr(product, 'primary_image', None) or product.logo.name or '',
+            price=product.discounted_price,
+            quantity=quantity,
+            ordered_size=size or None,
+            ordered_color_hex=color_hex or None,
+            ordered_color_name=color_name or None,
+        )
 
 
 class OrderAddress(models.Model):
@@ -157,4 +380,58 @@ class UserSubscription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.user.username} - {self.product.name} ({self.status})"
\ No newline at end of file
+        return f"{self.user.username} - {self.product.name} ({self.status})"
+
+
+class OutboundEmail(models.Model):
+    # Persistent outbox drained by the run_mail_worker command
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Sending', 'Sending'),
+        ('Sent', 'Sent'),
+        ('Failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # The worker polls for due messages
+            models.Index(fields=['status', 'next_attempt_at'], name='shop_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)} ({self.status})"
+
+
+class ProcessedStripeEvent(models.Model):
+    # One row per Stripe event ID; inserting it first is what deduplicates retries
+    STATUS_CHOICES = [
+        ('Received', 'Received'),
+        ('Processing', 'Processing'),
+        ('Processed', 'Processed'),
+        ('Failed', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, primary_key=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Received')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.type} {self.event_id} ({self.status})"
@@ -0,0 +1,11 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OrderCursorPagination(CursorPagination):
+    # Newest first. The cursor encodes the last (created_at, id) seen, so a
+    # page is an index range scan however deep the history goes, and orders
+    # placed while paging do not shift later pages.
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
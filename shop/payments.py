@@ -0,0 +1,323 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from itertools import count
+from types import SimpleNamespace
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+import requests
+from requests.adapters import HTTPAdapter
+import stripe
+
+# Every Stripe call goes through a payment gateway picked by
+# settings.PAYMENT_GATEWAY. StripeGateway talks to Stripe over one pooled
+# keep-alive session with explicit timeouts and retries; FakeGateway keeps
+# everything in memory so checkout and subscription flows can be exercised
+# or load-tested without network access. Both record per-call latency.
+
+
+class GatewayMetrics:
+    # Recent samples per operation, enough for p50/p95 without unbounded memory
+    WINDOW = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def record(self, operation, elapsed_ms, ok):
+        with self._lock:
+            entry = self._operations.setdefault(operation, {
+                'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'recent': deque(maxlen=self.WINDOW),
+            })
+            entry['calls'] += 1
+            entry['errors'] += 0 if ok else 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['recent'].append(elapsed_ms)
+
+    def snapshot(self):
+        with self._lock:
+            stats = {}
+            for operation, entry in self._operations.items():
+                recent = sorted(entry['recent'])
+                stats[operation] = {
+                    'calls': entry['calls'],
+                    'errors': entry['errors'],
+                    'avg_ms': round(entry['total_ms'] / entry['calls'], 2),
+                    'max_ms': round(entry['max_ms'], 2),
+                    'p50_ms': round(recent[len(recent) // 2], 2),
+                    'p95_ms': round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2),
+                }
+            return stats
+
+    def reset(self):
+        with self._lock:
+            self._operations = {}
+
+
+class BasePaymentGateway:
+    name = 'base'
+
+    def __init__(self):
+        self.metrics = GatewayMetrics()
+
+    def timed(self, operation, func, *args, **kwargs):
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            self.metrics.record(operation, (time.perf_counter() - start) * 1000, ok)
+
+    async def atimed(self, operation, func, *args, **kwargs):
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = await func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            self.metrics.record(operation, (time.perf_counter() - start) * 1000, ok)
+
+    def create_checkout_session(self, **params):
+        return self.timed('create_checkout_session', self._create_checkout_session, **params)
+
+    def retrieve_subscription(self, subscription_id):
+        return self.timed('retrieve_subscription', self._retrieve_subscription, subscription_id)
+
+    def modify_subscription_item(self, item_id, **params):
+        return self.timed('modify_subscription_item', self._modify_subscription_item, item_id, **params)
+
+    def delete_subscription_item(self, item_id):
+        return self.timed('delete_subscription_item', self._delete_subscription_item, item_id)
+
+    # Async variants for ASGI code; backends without native async support
+    # run the blocking call on a worker thread
+
+    async def acreate_checkout_session(self, **params):
+        return await self.atimed('create_checkout_session', self._acreate_checkout_session, **params)
+
+    async def aretrieve_subscription(self, subscription_id):
+        return await self.atimed('retrieve_subscription', self._aretrieve_subscription, subscription_id)
+
+    async def amodify_subscription_item(self, item_id, **params):
+        return await self.atimed('modify_subscription_item', self._amodify_subscription_item, item_id, **params)
+
+    async def adelete_subscription_item(self, item_id):
+        return await self.atimed('delete_subscription_item', self._adelete_subscription_item, item_id)
+
+    def _create_checkout_session(self, **params):
+        raise NotImplementedError
+
+    def _retrieve_subscription(self, subscription_id):
+        raise NotImplementedError
+
+    def _modify_subscription_item(self, item_id, **params):
+        raise NotImplementedError
+
+    def _delete_subscription_item(self, item_id):
+        raise NotImplementedError
+
+    async def _acreate_checkout_session(self, **params):
+        return await sync_to_async(self._create_checkout_session, thread_sensitive=False)(**params)
+
+    async def _aretrieve_subscription(self, subscription_id):
+        return await sync_to_async(self._retrieve_subscription, thread_sensitive=False)(subscription_id)
+
+    async def _amodify_subscription_item(self, item_id, **params):
+        return await sync_to_async(self._modify_subscription_item, thread_sensitive=False)(item_id, **params)
+
+    async def _adelete_subscription_item(self, item_id):
+        return await sync_to_async(self._delete_subscription_item, thread_sensitive=False)(item_id)
+
+
+class StripeGateway(BasePaymentGateway):
+    name = 'stripe'
+
+    def __init__(self, api_key=None, connect_timeout=None, read_timeout=None, max_retries=None, pool_size=None):
+        super().__init__()
+        self.api_key = api_key or settings.STRIPE_SECRET_KEY
+        connect_timeout = connect_timeout or getattr(settings, 'STRIPE_CONNECT_TIMEOUT', 5)
+        read_timeout = read_timeout or getattr(settings, 'STRIPE_READ_TIMEOUT', 20)
+        if max_retries is None:
+            max_retries = getattr(settings, 'STRIPE_MAX_NETWORK_RETRIES', 2)
+        pool_size = pool_size or getattr(settings, 'STRIPE_HTTP_POOL_SIZE', 10)
+
+        # One session shared by every thread so TLS connections are reused;
+        # urllib3 caps it at pool_size open connections
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+        self.async_client = self.build_async_client(read_timeout)
+        self.http_client = stripe.RequestsClient(
+            timeout=(connect_timeout, read_timeout),
+            session=session,
+            async_fallback_client=self.async_client,
+        )
+        # A client of our own rather than the stripe module globals, so two
+        # gateways (or other code using stripe) never share configuration.
+        # Stripe adds idempotency keys to retried requests.
+        self.client = stripe.StripeClient(
+            self.api_key,
+            http_client=self.http_client,
+            max_network_retries=max_retries,
+        )
+
+    def build_async_client(self, timeout):
+        # httpx is optional; without it the async variants use a thread
+        try:
+            return stripe.HTTPXClient(timeout=timeout)
+        except ImportError:
+            return None
+
+    def _create_checkout_session(self, **params):
+        return self.client.v1.checkout.sessions.create(params)
+
+    def _retrieve_subscription(self, subscription_id):
+        return self.client.v1.subscriptions.retrieve(subscription_id)
+
+    def _modify_subscription_item(self, item_id, **params):
+        return self.client.v1.subscription_items.update(item_id, params)
+
+    def _delete_subscription_item(self, item_id):
+        return self.client.v1.subscription_items.delete(item_id)
+
+    async def _acreate_checkout_session(self, **params):
+        if self.async_client is None:
+            return await super()._acreate_checkout_session(**params)
+        return await self.client.v1.checkout.sessions.create_async(params)
+
+    async def _aretrieve_subscription(self, subscription_id):
+        if self.async_client is None:
+            return await super()._aretrieve_subscription(subscription_id)
+        return await self.client.v1.subscriptions.retrieve_async(subscription_id)
+
+    async def _amodify_subscription_item(self, item_id, **params):
+        if self.async_client is None:
+            return await super()._amodify_subscription_item(item_id, **params)
+        return await self.client.v1.subscription_items.update_async(item_id, params)
+
+    async def _adelete_subscription_item(self, item_id):
+        if self.async_client is None:
+            return await super()._adelete_subscription_item(item_id)
+        return await self.client.v1.subscription_items.delete_async(item_id)
+
+
+class FakeGateway(BasePaymentGateway):
+    # In-memory stand-in for Stripe; latency (seconds) simulates the round trip
+    name = 'fake'
+
+    def __init__(self, latency=None):
+        super().__init__()
+        self.latency = latency if latency is not None else getattr(settings, 'FAKE_GATEWAY_LATENCY', 0)
+        self._ids = count(1)
+        self._lock = threading.Lock()
+        self.sessions = {}
+        self.subscriptions = {}
+
+    def next_id(self, prefix):
+        with self._lock:
+            return f"{prefix}_fake_{next(self._ids)}"
+
+    def add_subscription(self, subscription_id, prices):
+        """Register a subscription; prices is a list of (price_id, quantity)."""
+        items = [
+            {'id': self.next_id('si'), 'price': {'id': price_id}, 'quantity': quantity}
+            for price_id, quantity in prices
+        ]
+        self.subscriptions[subscription_id] = {'id': subscription_id, 'items': {'data': items}}
+        return self.subscriptions[subscription_id]
+
+    def find_item(self, item_id):
+        for subscription in self.subscriptions.values():
+            for item in subscription['items']['data']:
+                if item['id'] == item_id:
+                    return subscription, item
+        raise stripe.error.InvalidRequestError(f"No such subscription item: '{item_id}'", 'id')
+
+    def create_session(self, **params):
+        session_id = self.next_id('cs')
+        subscription = None
+        if params.get('mode') == 'subscription':
+            subscription = self.next_id('sub')
+            self.add_subscription(subscription, [
+                (item['price'], item['quantity']) for item in params.get('line_items', []) if 'price' in item
+            ])
+        session = SimpleNamespace(
+            id=session_id,
+            url=f"https://checkout.stripe.test/pay/{session_id}",
+            subscription=subscription,
+            params=params,
+        )
+        self.sessions[session_id] = session
+        return session
+
+    def get_subscription(self, subscription_id):
+        try:
+            return self.subscriptions[subscription_id]
+        except KeyError:
+            raise stripe.error.InvalidRequestError(f"No such subscription: '{subscription_id}'", 'id')
+
+    def update_item(self, item_id, **params):
+        subscription, item = self.find_item(item_id)
+        item.update(params)
+        return item
+
+    def remove_item(self, item_id):
+        subscription, item = self.find_item(item_id)
+        subscription['items']['data'].remove(item)
+        return {'id': item_id, 'deleted': True}
+
+    def _create_checkout_session(self, **params):
+        time.sleep(self.latency)
+        return self.create_session(**params)
+
+    def _retrieve_subscription(self, subscription_id):
+        time.sleep(self.latency)
+        return self.get_subscription(subscription_id)
+
+    def _modify_subscription_item(self, item_id, **params):
+        time.sleep(self.latency)
+        return self.update_item(item_id, **params)
+
+    def _delete_subscription_item(self, item_id):
+        time.sleep(self.latency)
+        return self.remove_item(item_id)
+
+    # No I/O to offload, so the async variants only simulate the latency
+
+    async def _acreate_checkout_session(self, **params):
+        await asyncio.sleep(self.latency)
+        return self.create_session(**params)
+
+    async def _aretrieve_subscription(self, subscription_id):
+        await asyncio.sleep(self.latency)
+        return self.get_subscription(subscription_id)
+
+    async def _amodify_subscription_item(self, item_id, **params):
+        await asyncio.sleep(self.latency)
+        return self.update_item(item_id, **params)
+
+    async def _adelete_subscription_item(self, item_id):
+        await asyncio.sleep(self.latency)
+        return self.remove_item(item_id)
+
+
+_gateway = None
+_gateway_path = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway, _gateway_path
+    path = getattr(settings, 'PAYMENT_GATEWAY', 'shop.payments.StripeGateway')
+    with _gateway_lock:
+        if _gateway is None or _gateway_path != path:
+            _gateway = import_string(path)()
+            _gateway_path = path
+        return _gateway
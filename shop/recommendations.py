@@ -0,0 +1,257 @@
+import heapq
+import json
+import math
+import sys
+import zlib
+from array import array
+from itertools import groupby
+from django.conf import settings
+from django.db import transaction
+from .cache import invalidate_catalog
+from .models import Order, OrderItem, Product, ProductRecommendation, RecommendationState
+
+# "Customers also bought" engine. Paid orders are read as baskets of product
+# ids and folded into a sparse, symmetric item-item co-occurrence matrix:
+# products get a dense row index, the diagonal (baskets containing each
+# product) lives in a flat array and each row keeps only its non-zero
+# columns. Neighbours are ranked by cosine or lift:
+#
+#   cosine(i, j) = c_ij / sqrt(n_i * n_j)
+#   lift(i, j)   = c_ij * N / (n_i * n_j)
+#
+# where c_ij counts baskets holding both products, n_i baskets holding i and
+# N all baskets. The matrix is persisted in RecommendationState, so
+# update_recommendations only folds in orders paid since the last run and
+# re-ranks the rows those orders could have changed. (A new basket also
+# raises N, which rescales every lift score by the same factor; rankings of
+# untouched rows stay correct, only their stored scores drift until the next
+# full rebuild.)
+
+BATCH_SIZE = 1000
+# RecommendationState is a singleton at this primary key
+STATE_PK = 1
+
+
+class CoPurchaseMatrix:
+    FORMAT_VERSION = 1
+
+    def __init__(self):
+        self.index = {}
+        self.product_ids = array('q')
+        self.item_counts = array('q')
+        self.rows = []
+        self.baskets = 0
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def row_for(self, product_id):
+        row = self.index.get(product_id)
+        if row is None:
+            row = self.index[product_id] = len(self.product_ids)
+            self.product_ids.append(product_id)
+            self.item_counts.append(0)
+            self.rows.append({})
+        return row
+
+    def add_basket(self, product_ids):
+        """Fold one order in; returns the rows it touched."""
+        rows = sorted({self.row_for(product_id) for product_id in product_ids})
+        self.baskets += 1
+        for position, i in enumerate(rows):
+            self.item_counts[i] += 1
+            row_i = self.rows[i]
+            for j in rows[position + 1:]:
+                row_i[j] = row_i.get(j, 0) + 1
+                row_j = self.rows[j]
+                row_j[i] = row_j.get(i, 0) + 1
+        return rows
+
+    def affected_rows(self, rows):
+        # New counts change n_i, which every neighbour of i divides by
+        affected = set(rows)
+        for i in rows:
+            affected.update(self.rows[i])
+        return affected
+
+    def score(self, i, j, co_purchases, metric):
+        if metric == 'lift':
+            return co_purchases * self.baskets / (self.item_counts[i] * self.item_counts[j])
+        return co_purchases / math.sqrt(self.item_counts[i] * self.item_counts[j])
+
+    def neighbors(self, product_id, k=10, metric='cosine', min_support=1):
+        """Top ``k`` (product_id, score, co_purchases) for one product."""
+        row = self.index.get(product_id)
+        if row is None:
+            return []
+        return self.row_neighbors(row, k, metric, min_support)
+
+    def row_neighbors(self, i, k, metric, min_support):
+        scored = (
+            (self.score(i, j, co_purchases, metric), -self.product_ids[j], co_purchases)
+            for j, co_purchases in self.rows[i].items()
+            if co_purchases >= min_support
+        )
+        return [
+            (-negative_id, score, co_purchases)
+            for score, negative_id, co_purchases in heapq.nlargest(k, scored)
+        ]
+
+    def top_k(self, k=10, metric='cosine', min_support=1, rows=None):
+        """{product_id: neighbours} for ``rows`` (row indexes), or every product."""
+        rows = range(len(self)) if rows is None else rows
+        return {
+            self.product_ids[i]: self.row_neighbors(i, k, metric, min_support)
+            for i in rows
+        }
+
+    def to_bytes(self):
+        # CSR over the upper triangle; the lower one is its mirror image
+        indptr, indices, data = array('q', [0]), array('q'), array('q')
+        for i, row in enumerate(self.rows):
+            for j in sorted(row):
+                if j > i:
+                    indices.append(j)
+                    data.append(row[j])
+            indptr.append(len(indices))
+
+        parts = [self.product_ids, self.item_counts, indptr, indices, data]
+        header = json.dumps({
+            'version': self.FORMAT_VERSION,
+            'byteorder': sys.byteorder,
+            'baskets': self.baskets,
+            'lengths': [len(part) for part in parts],
+        }).encode()
+        return zlib.compress(header + b'\n' + b''.join(part.tobytes() for part in parts))
+
+    @classmethod
+    def from_bytes(cls, blob):
+        raw = zlib.decompress(bytes(blob))
+        header, _, body = raw.partition(b'\n')
+        header = json.loads(header)
+        if header['version'] != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported matrix format {header['version']}")
+
+        parts, offset = [], 0
+        for length in header['lengths']:
+            part = array('q')
+            part.frombytes(body[offset:offset + length * part.itemsize])
+            if header['byteorder'] != sys.byteorder:
+                part.byteswap()
+            parts.append(part)
+            offset += length * part.itemsize
+        product_ids, item_counts, indptr, indices, data = parts
+
+        matrix = cls()
+        matrix.baskets = header['baskets']
+        matrix.product_ids = product_ids
+        matrix.item_counts = item_counts
+        matrix.index = {product_id: row for row, product_id in enumerate(product_ids)}
+        matrix.rows = [{} for _ in product_ids]
+        for i in range(len(product_ids)):
+            row_i = matrix.rows[i]
+            for position in range(indptr[i], indptr[i + 1]):
+                j, co_purchases = indices[position], data[position]
+                row_i[j] = co_purchases
+                matrix.rows[j][i] = co_purchases
+        return matrix
+
+
+def baskets(lines):
+    """Group (order_id, product_id) lines, sorted by order, into product id lists."""
+    for _, group in groupby(lines, key=lambda line: line[0]):
+        yield [product_id for _, product_id in group]
+
+
+def basket_lines(orders):
+    return OrderItem.objects.filter(
+        order__in=orders, product__isnull=False
+    ).order_by('order_id').values_list('order_id', 'product_id').iterator(chunk_size=10000)
+
+
+def recommendation_settings():
+    return (
+        getattr(settings, 'RECOMMENDATION_TOP_K', 10),
+        getattr(settings, 'RECOMMENDATION_METRIC', 'cosine'),
+        getattr(settings, 'RECOMMENDATION_MIN_SUPPORT', 1),
+    )
+
+
+def save_recommendations(neighbours, replace_all=False):
+    # Products deleted since their orders were counted are left out
+    existing = set(Product.objects.values_list('pk', flat=True))
+    if replace_all:
+        ProductRecommendation.objects.all().delete()
+    else:
+        product_ids = list(neighbours)
+        for start in range(0, len(product_ids), BATCH_SIZE):
+            ProductRecommendation.objects.filter(product_id__in=product_ids[start:start + BATCH_SIZE]).delete()
+
+    rows = [
+        ProductRecommendation(product_id=product_id, recommended_id=other, score=score, co_purchases=co_purchases)
+        for product_id, others in neighbours.items()
+        if product_id in existing
+        for other, score, co_purchases in others
+        if other in existing
+    ]
+    ProductRecommendation.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    # The also-bought endpoint is served through the catalog cache
+    invalidate_catalog()
+    return len(rows)
+
+
+def locked_state():
+    # get_or_create on a fixed key: concurrent first runs cannot each
+    # insert a state row of their own
+    state, _ = RecommendationState.objects.select_for_update().get_or_create(pk=STATE_PK)
+    return state
+
+
+def save_state(state, matrix):
+    state.matrix = matrix.to_bytes()
+    state.baskets = matrix.baskets
+    state.save()
+
+
+def rebuild_recommendations():
+    """Rebuild the matrix from every paid order and rewrite all recommendations."""
+    k, metric, min_support = recommendation_settings()
+    with transaction.atomic():
+        state = locked_state()
+        Order.objects.filter(is_paid=True, recommendations_indexed=False).update(recommendations_indexed=True)
+
+        matrix = CoPurchaseMatrix()
+        for basket in baskets(basket_lines(Order.objects.filter(is_paid=True))):
+            matrix.add_basket(basket)
+
+        save_recommendations(matrix.top_k(k, metric, min_support), replace_all=True)
+        save_state(state, matrix)
+    return matrix
+
+
+def update_recommendations():
+    """Fold in orders paid since the last run; returns how many were added."""
+    k, metric, min_support = recommendation_settings()
+    with transaction.atomic():
+        # The row lock keeps concurrent updates from folding an order twice
+        state = locked_state()
+        if not state.matrix:
+            return rebuild_recommendations().baskets
+
+        order_ids = list(
+            Order.objects.filter(is_paid=True, recommendations_indexed=False).values_list('pk', flat=True)
+        )
+        if not order_ids:
+            return 0
+
+        matrix = CoPurchaseMatrix.from_bytes(state.matrix)
+        touched = set()
+        for start in range(0, len(order_ids), BATCH_SIZE):
+            batch = order_ids[start:start + BATCH_SIZE]
+            Order.objects.filter(pk__in=batch).update(recommendations_indexed=True)
+            for basket in baskets(basket_lines(batch)):
+                touched.update(matrix.add_basket(basket))
+
+        save_recommendations(matrix.top_k(k, metric, min_support, rows=matrix.affected_rows(touched)))
+        save_state(state, matrix)
+    return len(order_ids)
@@ -0,0 +1,148 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from .cache import invalidate_catalog
+from .models import OrderItem, Product, RelatedProduct
+
+# Each product's "related products" list is precomputed into RelatedProduct,
+# so the product page reads it instead of sampling the category per request.
+# A candidate's score is the number of paid orders that contained both
+# products, plus a fractional bonus for sharing the type or category: any
+# co-purchase outranks plain similarity, which breaks ties and fills the
+# list for products nobody has bought yet.
+#
+# Co-purchase counts only change for products in a newly paid order, so
+# refresh_order_related_products recomputes just those lists. Moving a
+# product to another type or category refreshes its own list and the lists
+# that already show it (see shop.signals). Other products only pick up the
+# move, and sales-rank drift in the similarity fill, when the
+# rebuild_related_products command recomputes everything; run it with
+# --interval, or from cron, to keep them fresh.
+
+SAME_TYPE_SCORE = 0.5
+SAME_CATEGORY_SCORE = 0.25
+# Best-selling peers considered per product for the similarity fill
+SIMILAR_CANDIDATES = 20
+
+
+def related_limit():
+    return getattr(settings, 'RELATED_PRODUCTS_LIMIT', 4)
+
+
+def related_models(apps=None):
+    # Migrations pass their historical app registry
+    if apps is None:
+        return Product, OrderItem, RelatedProduct
+    return tuple(apps.get_model('shop', name) for name in ('Product', 'OrderItem', 'RelatedProduct'))
+
+
+def co_purchase_counts(product_ids, apps=None):
+    """{product_id: {other_id: paid orders containing both}} in one query."""
+    _, OrderItem, _ = related_models(apps)
+    rows = OrderItem.objects.filter(
+        order__is_paid=True,
+        product__isnull=False,
+        order__items__product_id__in=product_ids,
+    ).values('order__items__product_id', 'product_id').annotate(
+        orders=Count('order_id', distinct=True),
+    ).order_by()
+
+    counts = defaultdict(dict)
+    for row in rows:
+        anchor, other = row['order__items__product_id'], row['product_id']
+        if anchor != other:
+            counts[anchor][other] = row['orders']
+    return counts
+
+
+def similarity(product, other):
+    score = 0.0
+    if product['type_id'] is not None and product['type_id'] == other['type_id']:
+        score += SAME_TYPE_SCORE
+    if product['category'] == other['category']:
+        score += SAME_CATEGORY_SCORE
+    return score
+
+
+def compute_related(product_ids, apps=None):
+    """Return the RelatedProduct rows for ``product_ids``, unsaved."""
+    Product, _, RelatedProduct = related_models(apps)
+    fields = ('id', 'type_id', 'category')
+    counts = co_purchase_counts(product_ids, apps)
+    bought_with = {other for others in counts.values() for other in others}
+    products = {
+        product['id']: product
+        for product in Product.objects.filter(pk__in=set(product_ids) | bought_with).values(*fields)
+    }
+
+    anchors = [products[pk] for pk in product_ids if pk in products]
+    # Best sellers first, which also breaks score ties
+    peers = list(Product.objects.filter(
+        Q(type_id__in={p['type_id'] for p in anchors if p['type_id'] is not None})
+        | Q(category__in={p['category'] for p in anchors})
+    ).order_by('-order_count', '-created_at').values(*fields))
+    popularity = {peer['id']: rank for rank, peer in enumerate(peers)}
+    for peer in peers:
+        products.setdefault(peer['id'], peer)
+
+    rows = []
+    for product in anchors:
+        co_purchases = counts.get(product['id'], {})
+        similar = [peer['id'] for peer in peers if peer['id'] != product['id'] and similarity(product, peer)]
+        candidates = set(co_purchases) | set(similar[:SIMILAR_CANDIDATES])
+
+        scored = sorted(
+            (
+                (co_purchases.get(pk, 0) + similarity(product, products[pk]), pk)
+                for pk in candidates
+                if pk in products
+            ),
+            key=lambda entry: (-entry[0], popularity.get(entry[1], len(peers)), entry[1]),
+        )
+        rows.extend(
+            RelatedProduct(
+                product_id=product['id'],
+                related_id=pk,
+                score=score,
+                co_purchases=co_purchases.get(pk, 0),
+            )
+            for score, pk in scored[:related_limit()]
+        )
+    return rows
+
+
+def refresh_related_products(product_ids):
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+    rows = compute_related(product_ids)
+    with transaction.atomic():
+        RelatedProduct.objects.filter(product_id__in=product_ids).delete()
+        RelatedProduct.objects.bulk_create(rows)
+        # Product pages embed the list
+        invalidate_catalog()
+    return len(rows)
+
+
+def refresh_order_related_products(order_id):
+    product_ids = OrderItem.objects.filter(
+        order_id=order_id, product__isnull=False
+    ).values_list('product_id', flat=True).distinct()
+    return refresh_related_products(product_ids)
+
+
+def refresh_regrouped_product(product_id):
+    # Its own list, plus the lists it may no longer belong in
+    product_ids = {product_id} | set(
+        RelatedProduct.objects.filter(related_id=product_id).values_list('product_id', flat=True)
+    )
+    return refresh_related_products(product_ids)
+
+
+def rebuild_related_products(batch_size=500):
+    product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+    written = 0
+    for start in range(0, len(product_ids), batch_size):
+        written += refresh_related_products(product_ids[start:start + batch_size])
+    return written
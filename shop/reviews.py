@@ -0,0 +1,63 @@
+from django.db.models import Avg, Count, Q
+from .models import Product
+
+STAR_RATINGS = range(0, 6)
+
+
+def star_count_aggregates(prefix=''):
+    # prefix reaches reviews through a relation, e.g. 'reviews__'
+    return {f'star_{n}': Count(f'{prefix}id', filter=Q(**{f'{prefix}rating': n})) for n in STAR_RATINGS}
+
+
+def format_review_stats(total_reviews, average_rating, star_counts, recommended_count):
+    # Response shape shared by the stats endpoints; 0-star reviews are counted
+    # in the total but, as before, not listed in star_counts.
+    if not total_reviews:
+        return {
+            "total_reviews": 0,
+            "average_rating": 0,
+            "star_counts": {f"{n}_star": 0 for n in STAR_RATINGS if n},
+            "recommended_percentage": 0
+        }
+
+    return {
+        "total_reviews": total_reviews,
+        "average_rating": round(average_rating, 1) if average_rating else 0,
+        "star_counts": {f"{n}_star": star_counts.get(n, 0) for n in STAR_RATINGS if n},
+        # Assuming recommended means rating >= 4
+        "recommended_percentage": round((recommended_count / total_reviews) * 100, 1),
+    }
+
+
+def summary_review_stats(summary):
+    star_counts = {n: getattr(summary, f'star_{n}') for n in STAR_RATINGS}
+    return format_review_stats(
+        summary.review_count,
+        summary.rating_sum / summary.review_count if summary.review_count else 0,
+        star_counts,
+        star_counts[4] + star_counts[5],
+    )
+
+
+def review_stats_for(product_ids):
+    """Review stats for many products in one grouped query, keyed by product id.
+
+    Ids that match no product are left out, so they cannot be mistaken for
+    products without reviews.
+    """
+    rows = Product.objects.filter(pk__in=list(product_ids)).values('pk').annotate(
+        total_reviews=Count('reviews'),
+        average_rating=Avg('reviews__rating'),
+        recommended_count=Count('reviews', filter=Q(reviews__rating__gte=4)),
+        **star_count_aggregates('reviews__'),
+    ).order_by()
+
+    return {
+        row['pk']: format_review_stats(
+            row['total_reviews'],
+            row['average_rating'],
+            {n: row[f'star_{n}'] for n in STAR_RATINGS},
+            row['recommended_count'],
+        )
+        for row in rows
+    }
@@ -0,0 +1,149 @@
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from .models import Product
+
+# Product search runs against a per-database full-text index table that holds
+# one document per product (name, description, type name and category). The
+# table is created by migration 0031 and kept in sync by shop.signals.
+
+SQLITE_TABLE = 'shop_product_fts'
+POSTGRES_TABLE = 'shop_product_search'
+
+TERM_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def search_terms(query):
+    # Only word characters reach the full-text engines, so user input can
+    # never inject MATCH / tsquery operators
+    return TERM_RE.findall(query.lower())
+
+
+def product_document(product):
+    return {
+        'name': product.name,
+        'description': product.description or '',
+        'type_name': product.type.name if product.type_id else '',
+        'category': product.category,
+    }
+
+
+class BaseSearchBackend:
+    def search(self, terms, limit):
+        """Return up to ``limit`` product IDs matching every term, best first."""
+        raise NotImplementedError
+
+    def index_products(self, products):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def rebuild(self):
+        products = Product.objects.select_related('type')
+        self.remove_products(products.values_list('pk', flat=True))
+        self.index_products(products)
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    # Fallback for databases without a full-text index: every term must match
+    # the name, type name or category
+    def search(self, terms, limit):
+        combined_q = Q()
+        for term in terms:
+            combined_q &= Q(name__icontains=term) | Q(type__name__icontains=term) | Q(category__icontains=term)
+        return list(Product.objects.filter(combined_q).order_by('id').values_list('pk', flat=True)[:limit])
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    # Column weights for bm25(), in table column order
+    WEIGHTS = (10.0, 1.0, 4.0, 4.0)
+
+    def search(self, terms, limit):
+        # Each term is a quoted prefix query; FTS5 ANDs space separated terms
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(w) for w in self.WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s "
+                f"ORDER BY bm25({SQLITE_TABLE}, {weights}) LIMIT %s",
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index_products(self, products):
+        products = list(products)
+        self.remove_products([product.pk for product in products])
+        rows = [
+            (product.pk, doc['name'], doc['description'], doc['type_name'], doc['category'])
+            for product, doc in ((product, product_document(product)) for product in products)
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, name, description, type_name, category) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def remove_products(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [(pk,) for pk in product_ids])
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    DOCUMENT_SQL = (
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'C')"
+    )
+
+    def search(self, terms, limit):
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT product_id FROM {POSTGRES_TABLE}, to_tsquery('simple', %s) query "
+                f"WHERE document @@ query ORDER BY ts_rank(document, query) DESC, product_id LIMIT %s",
+                [tsquery, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index_products(self, products):
+        rows = []
+        for product in products:
+            doc = product_document(product)
+            rows.append((product.pk, doc['name'], doc['type_name'], doc['category'], doc['description']))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {POSTGRES_TABLE} (product_id, document) VALUES (%s, {self.DOCUMENT_SQL}) "
+                f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove_products(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {POSTGRES_TABLE} WHERE product_id = ANY(%s)", [list(product_ids)])
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    backend_path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    return VENDOR_BACKENDS.get(connection.vendor, LikeSearchBackend)()
+
+
+def search_products(query, limit=None):
+    """Ranked product IDs for a free text query, capped at ``limit``."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if limit is None:
+        limit = getattr(settings, 'PRODUCT_SEARCH_MAX_RESULTS', 100)
+    return get_search_backend().search(terms, limit)
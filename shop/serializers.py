@@ -1,5 +1,6 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from . models import Type, Product, ProductImage, Review, CartItem, Order, OrderItem, OrderAddress, ContactMessage, UserSubscription
+from . models import Type, Product, ProductImage, ProductRatingSummary, Review, CartItem, Order, OrderItem, OrderAddress, ContactMessage, UserSubscription
 
 
 class TypeSerializer(serializers.ModelSerializer):
@@ -41,7 +42,72 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = '__all__'
 
+
+class ProductListSerializer(serializers.ModelSerializer):
+    # Listing payload: review aggregates instead of every review body.
+    # Expects a queryset built with Product.objects.for_listing().
+    type = TypeSerializer()
+    images = ProductImageSerializer(many=True, read_only=True)
+    review_count = serializers.SerializerMethodField()
+    average_rating = serializers.SerializerMethodField()
+    star_counts = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = '__all__'
+
+    def get_rating_summary(self, obj):
+        try:
+            return obj.rating_summary
+        except ProductRatingSummary.DoesNotExist:
+            return None
+
+    def get_review_count(self, obj):
+        summary = self.get_rating_summary(obj)
+        return summary.review_count if summary else 0
+
+    def get_average_rating(self, obj):
+        summary = self.get_rating_summary(obj)
+        return summary.average_rating if summary else 0
+
+    def get_star_counts(self, obj):
+        summary = self.get_rating_summary(obj)
+        return {f"{n}_star": getattr(summary, f"star_{n}") if summary else 0 for n in range(1, 6)}
+
+def storage_url(name, request=None):
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def primary_image_url(product, request=None):
+    # First gallery image (see Product.objects.with_primary_image), falling back to the logo
+    return storage_url(getattr(product, 'primary_image', None) or product.logo.name, request)
+
+
+class CartProductSerializer(serializers.ModelSerializer):
+    # Just enough to draw a cart line; expects Product.objects.with_primary_image()
+    price = serializers.DecimalField(source='discounted_price', max_digits=10, decimal_places=2, read_only=True)
+    image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'initial_price', 'price', 'image']
+
+    def get_image(self, obj):
+        return primary_image_url(obj, self.context.get('request'))
+
+
 class CartItemSerializer(serializers.ModelSerializer):
+    product = CartProductSerializer(read_only=True)
+    class Meta:
+        model = CartItem
+        fields = ['id', 'product', 'quantity', 'selected_size', 'selected_color_hex', 'selected_color_name', 'added_at']
+
+
+class CartItemExpandedSerializer(serializers.ModelSerializer):
+    # The full product payload, for ?expand=product
     product = ProductSerializer()
     class Meta:
         model = CartItem
@@ -49,10 +115,18 @@ class CartItemSerializer(serializers.ModelSerializer):
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    # Rendered from the line's own snapshot; product is only the id it was bought from
+    image = serializers.SerializerMethodField()
+
     class Meta:
         model = OrderItem
-        fields = ['id', 'order', 'product', 'price', 'quantity', 'is_free_item', 'free_item_size']
+        fields = [
+            'id', 'order', 'product', 'product_name', 'image', 'price', 'quantity',
+            'ordered_size', 'ordered_color_hex', 'ordered_color_name', 'is_free_item', 'free_item_size',
+        ]
+
+    def get_image(self, obj):
+        return storage_url(obj.product_image, self.context.get('request'))
 
 
 class OrderAddressSerializer(serializers.ModelSerializer):
@@ -63,11 +137,35 @@ class OrderAddressSerializer(serializers.ModelSerializer):
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
-    address = OrderAddressSerializer(read_only=True)
+    address = OrderAddressSerializer(source='orderaddress', read_only=True, allow_null=True)
 
     class Meta:
         model = Order
-        fields = '__all__'
+        exclude = ['recommendations_indexed']
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    # Order history row; expects Order.objects.for_summary()
+    THUMBNAILS = 4
+
+    item_count = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        fields = ['id', 'status', 'is_paid', 'total_price', 'shipping_fee', 'item_count', 'thumbnails', 'created_at']
+
+    def get_item_count(self, obj):
+        return sum(item.quantity for item in obj.items.all())
+
+    def get_thumbnails(self, obj):
+        request = self.context.get('request')
+        thumbnails = []
+        for item in obj.items.all():
+            url = storage_url(item.product_image, request)
+            if url and url not in thumbnails:
+                thumbnails.append(url)
+        return thumbnails[:self.THUMBNAILS]
 
 
 class ContactMessageSerializer(serializers.ModelSerializer):
@@ -89,18 +187,75 @@ class CheckoutAddressSerializer(serializers.Serializer):
     type = serializers.ChoiceField(choices=[('home', 'Home'), ('office', 'Office')])
 
 
+class CartVariantSerializer(serializers.Serializer):
+    # Lengths match the CartItem columns
+    selected_size = serializers.CharField(max_length=3, required=False, allow_blank=True, allow_null=True)
+    selected_color_hex = serializers.CharField(max_length=7, required=False, allow_blank=True, allow_null=True)
+    selected_color_name = serializers.CharField(max_length=50, required=False, allow_blank=True, allow_null=True)
+
+
+class CartOperationSerializer(CartVariantSerializer):
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, data):
+        if data['op'] == 'add':
+            data.setdefault('quantity', 1)
+            if data['quantity'] < 1:
+                raise serializers.ValidationError({'quantity': 'Quantity must be at least 1'})
+        elif data['op'] == 'set' and 'quantity' not in data:
+            raise serializers.ValidationError({'quantity': 'This field is required.'})
+        return data
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
+
+    def validate_operations(self, value):
+        # Resolve every product in one query
+        product_ids = {operation['product_id'] for operation in value}
+        products = Product.objects.in_bulk(list(product_ids))
+        missing = sorted(product_ids - set(products))
+        if missing:
+            raise serializers.ValidationError(
+                f"Products not found: {', '.join(str(product_id) for product_id in missing)}"
+            )
+        for operation in value:
+            operation['product'] = products[operation['product_id']]
+        return value
+
+
 class GuestCartItemSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1)
 
 
 class GuestCheckoutSerializer(serializers.Serializer):
-    cart_items = GuestCartItemSerializer(many=True)
+    cart_items = GuestCartItemSerializer(many=True, allow_empty=False)
     address = CheckoutAddressSerializer()
     email = serializers.EmailField()
     free_tshirt_size = serializers.ChoiceField(choices=['S', 'M', 'L', 'XL', 'XXL'], required=False)
     is_subscription = serializers.BooleanField(default=False)
 
+    def validate_cart_items(self, value):
+        # Merge repeated lines, then resolve every product in one query
+        quantities = {}
+        for line in value:
+            quantities[line['product_id']] = quantities.get(line['product_id'], 0) + line['quantity']
+
+        products = Product.objects.with_primary_image().in_bulk(list(quantities))
+        missing = [product_id for product_id in quantities if product_id not in products]
+        if missing:
+            raise serializers.ValidationError(
+                f"Products not found: {', '.join(str(product_id) for product_id in missing)}"
+            )
+
+        return [
+            {'product_id': product_id, 'product': products[product_id], 'quantity': quantity}
+            for product_id, quantity in quantities.items()
+        ]
+
 
 class AuthenticatedCheckoutSerializer(serializers.Serializer):
     address = CheckoutAddressSerializer()
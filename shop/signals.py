@@ -0,0 +1,105 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from .models import Product, ProductImage, Review, ProductRatingSummary, Type
+from .cache import invalidate_catalog
+from .home import schedule_home_feed_rebuild
+from .related import refresh_regrouped_product, refresh_related_products
+from .search import get_search_backend
+
+# User fields ReviewSerializer shows as the reviewer's name
+REVIEW_AUTHOR_FIELDS = {'first_name', 'last_name', 'username'}
+# Product fields the related products similarity score compares
+RELATED_GROUPING_FIELDS = {'type', 'type_id', 'category'}
+
+
+@receiver(post_save, sender=Product)
+def create_rating_summary(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProductRatingSummary.objects.get_or_create(product=instance)
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    # Admin edits can change the rating or move a review to another product
+    instance._previous_rating = None
+    if instance.pk and not raw:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list('product_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def count_saved_review(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    if previous == (instance.product_id, instance.rating):
+        return
+    if previous:
+        ProductRatingSummary.apply_review(previous[0], previous[1], delta=-1)
+    ProductRatingSummary.apply_review(instance.product_id, instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def uncount_deleted_review(sender, instance, **kwargs):
+    ProductRatingSummary.apply_review(instance.product_id, instance.rating, delta=-1)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=Type)
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_catalog_cache(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_catalog()
+        schedule_home_feed_rebuild()
+
+
+@receiver(post_save, sender=User)
+def refresh_review_authors(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # The home feed shows reviewer names; saves that cannot touch them
+    # (last_login on every sign-in) skip the query
+    if created or raw or (update_fields is not None and not REVIEW_AUTHOR_FIELDS & set(update_fields)):
+        return
+    if Review.objects.filter(user_name=instance).exists():
+        schedule_home_feed_rebuild()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend().index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Type)
+def reindex_type_products(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        get_search_backend().index_products(Product.objects.filter(type=instance).select_related('type'))
+
+
+@receiver(post_save, sender=Product)
+def relate_new_product(sender, instance, created, raw=False, **kwargs):
+    # Give a new product a related list straight away; other products pick
+    # it up on their next refresh
+    if created and not raw:
+        transaction.on_commit(lambda: refresh_related_products([instance.pk]))
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_grouping(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_grouping = None
+    if instance.pk and not raw and (update_fields is None or RELATED_GROUPING_FIELDS & set(update_fields)):
+        instance._previous_grouping = Product.objects.filter(pk=instance.pk).values_list('type_id', 'category').first()
+
+
+@receiver(post_save, sender=Product)
+def regroup_related_products(sender, instance, created, raw=False, **kwargs):
+    # A new type or category changes which products count as similar
+    previous = getattr(instance, '_previous_grouping', None)
+    if not created and not raw and previous and previous != (instance.type_id, instance.category):
+        transaction.on_commit(lambda: refresh_regrouped_product(instance.pk))
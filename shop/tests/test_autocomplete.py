@@ -0,0 +1,98 @@
+import unittest
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from shop.autocomplete import AutocompleteIndex, get_autocomplete_index
+from shop.models import Product, Type
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+class AutocompleteIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = AutocompleteIndex([
+            ('product', 1, 'Wolverine Shirt'),
+            ('product', 2, 'Whey Protein'),
+            ('product', 3, 'Protein Bar'),
+            ('type', 1, 'Supplements'),
+        ])
+
+    def labels(self, query):
+        return [result['label'] for result in self.index.lookup(query)]
+
+    def test_prefix(self):
+        self.assertEqual(self.labels('prot'), ['Protein Bar', 'Whey Protein'])
+        self.assertEqual(self.labels('w'), ['Whey Protein', 'Wolverine Shirt'])
+
+    def test_typos(self):
+        self.assertEqual(self.labels('wolverin')[0], 'Wolverine Shirt')
+        self.assertEqual(self.labels('wolverien')[0], 'Wolverine Shirt')
+        self.assertEqual(self.labels('suplements'), ['Supplements'])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.labels('whey prot'), ['Whey Protein'])
+        self.assertEqual(self.labels('shirt protein'), [])
+
+    def test_exact_ranks_above_fuzzy(self):
+        results = self.index.lookup('protein')
+        self.assertEqual(results[0]['score'], 1.0)
+
+    def test_stats(self):
+        stats = self.index.stats()
+        self.assertEqual(stats['entries'], 4)
+        self.assertGreater(stats['memory_bytes'], 0)
+        self.assertGreaterEqual(stats['build_ms'], 0)
+
+
+class ProductAutocompleteViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('product-autocomplete')
+        self.type = Type.objects.create(name='Apparel')
+        self.product = Product.objects.create(
+            category='Merchandise',
+            type=self.type,
+            name='Wolverine Shirt',
+            initial_price=100.00,
+            discounted_price=80.00,
+            description='Description',
+        )
+
+    def test_lookup_without_queries(self):
+        self.client.get(self.url, {'q': 'wol'})
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'q': 'wolverin'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0], {'type': 'product', 'id': self.product.id, 'label': 'Wolverine Shirt', 'score': 1.0})
+
+    def test_rebuilds_after_catalog_change(self):
+        index = get_autocomplete_index()
+        Product.objects.create(
+            category='Merchandise',
+            name='Logan Cap',
+            initial_price=10.00,
+            discounted_price=8.00,
+            description='Description',
+        )
+        response = self.client.get(self.url, {'q': 'logan'})
+        self.assertEqual(response.data['results'][0]['label'], 'Logan Cap')
+        self.assertIsNot(get_autocomplete_index(), index)
+
+    def test_limit_is_clamped(self):
+        for i in range(30):
+            Product.objects.create(
+                category='Merchandise',
+                name=f'Wolverine Mug {i}',
+                initial_price=10.00,
+                discounted_price=8.00,
+                description='Description',
+            )
+        self.assertEqual(len(self.client.get(self.url, {'q': 'wol', 'limit': -1}).data['results']), 1)
+        self.assertEqual(len(self.client.get(self.url, {'q': 'wol', 'limit': 100}).data['results']), 25)
+
+    def test_stats_for_staff(self):
+        admin = User.objects.create_user(username='admin', password='password', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(reverse('product-autocomplete-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('memory_bytes', response.data)
@@ -0,0 +1,322 @@
+import decimal
+import threading
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.models import User
+from shop.cart import add_to_cart, apply_cart_operations, cart_summary
+from shop.models import CartItem, Product, ProductImage
+from shop.serializers import CartBatchSerializer
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+class CartQuantityTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(
+            category='Merchandise',
+            name='T-shirt',
+            initial_price=100.00,
+            discounted_price=90.00,
+            description='Description',
+        )
+
+    def test_add_to_cart_accumulates(self):
+        url = reverse('add-to-cart', args=[self.product.pk])
+        self.client.post(url, {'quantity': 2})
+        response = self.client.post(url, {'quantity': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['quantity'], 5)
+        self.assertEqual(CartItem.objects.get().quantity, 5)
+
+    def test_add_to_cart_keeps_variants_apart(self):
+        url = reverse('add-to-cart', args=[self.product.pk])
+        self.client.post(url, {'selected_size': 'M', 'selected_color_hex': '#000000'})
+        self.client.post(url, {'selected_size': 'L', 'selected_color_hex': '#000000'})
+        response = self.client.post(url, {'selected_size': 'M', 'selected_color_hex': '#000000'})
+
+        self.assertEqual(response.data['quantity'], 2)
+        self.assertEqual(
+            dict(CartItem.objects.values_list('selected_size', 'quantity')),
+            {'M': 2, 'L': 1},
+        )
+
+    def test_plain_line_is_unique(self):
+        add_to_cart(self.user, self.product, 1)
+        add_to_cart(self.user, self.product, 1, selected_size='')
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_add_to_cart_rejects_bad_quantity(self):
+        response = self.client.post(reverse('add-to-cart', args=[self.product.pk]), {'quantity': 'many'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_add_to_cart_rejects_oversized_variant(self):
+        response = self.client.post(reverse('add-to-cart', args=[self.product.pk]), {'selected_size': 'TOOLONG'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('selected_size', response.data)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_increase_is_a_single_update(self):
+        item = CartItem.objects.create(user=self.user, product=self.product, quantity=1)
+        with self.assertNumQueries(4):  # SAVEPOINT, UPDATE, SELECT, RELEASE
+            response = self.client.post(reverse('increase-cart-item', args=[item.pk]))
+        self.assertEqual(response.data['quantity'], 2)
+
+    def test_decrease_stops_at_one(self):
+        item = CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+        url = reverse('decrease-cart-item', args=[item.pk])
+
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['quantity'], 1)
+
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 1)
+
+    def test_other_users_lines_are_not_found(self):
+        other = User.objects.create_user(username='other', password='password')
+        item = CartItem.objects.create(user=other, product=self.product, quantity=2)
+
+        self.assertEqual(self.client.post(reverse('increase-cart-item', args=[item.pk])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.post(reverse('decrease-cart-item', args=[item.pk])).status_code, status.HTTP_404_NOT_FOUND)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 2)
+
+
+class CartBatchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('cart-view')
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.products = [
+            Product.objects.create(
+                category='Merchandise',
+                name=f'Product {i}',
+                initial_price=100.00,
+                discounted_price=100.00,
+                description='Description',
+            )
+            for i in range(4)
+        ]
+
+    def test_batch_applies_every_operation(self):
+        shirt, cap, mug, socks = self.products
+        CartItem.objects.create(user=self.user, product=cap, quantity=5)
+        CartItem.objects.create(user=self.user, product=mug, quantity=1)
+        CartItem.objects.create(user=self.user, product=socks, quantity=2)
+
+        response = self.client.patch(self.url, {'operations': [
+            {'op': 'add', 'product_id': shirt.id, 'quantity': 1, 'selected_size': 'M', 'selected_color_hex': '#000000', 'selected_color_name': 'Black'},
+            {'op': 'add', 'product_id': shirt.id, 'quantity': 2, 'selected_size': 'L', 'selected_color_hex': '#000000'},
+            {'op': 'add', 'product_id': shirt.id, 'quantity': 1, 'selected_size': 'M', 'selected_color_hex': '#000000'},
+            {'op': 'set', 'product_id': cap.id, 'quantity': 2},
+            {'op': 'remove', 'product_id': mug.id},
+            {'op': 'add', 'product_id': socks.id, 'quantity': 3},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cart = {
+            (item.product_id, item.selected_size): item.quantity
+            for item in CartItem.objects.filter(user=self.user)
+        }
+        self.assertEqual(cart, {(shirt.id, 'M'): 2, (shirt.id, 'L'): 2, (cap.id, None): 2, (socks.id, None): 5})
+        self.assertEqual(CartItem.objects.get(product=shirt, selected_size='M').selected_color_name, 'Black')
+        self.assertEqual(len(response.data['items']), 4)
+        self.assertEqual(response.data['subtotal'], 1100)
+
+    def test_set_to_zero_removes_line(self):
+        CartItem.objects.create(user=self.user, product=self.products[0], quantity=3)
+        response = self.client.patch(self.url, {'operations': [
+            {'op': 'set', 'product_id': self.products[0].id, 'quantity': 0},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_batch_write_queries_are_constant(self):
+        def batch_queries(products):
+            CartItem.objects.all().delete()
+            for product in products:
+                CartItem.objects.create(user=self.user, product=product, quantity=1)
+            operations = [{'op': 'add', 'product_id': p.id, 'quantity': 1} for p in products]
+            operations += [{'op': 'add', 'product_id': p.id, 'quantity': 1, 'selected_size': 'S'} for p in products]
+            with CaptureQueriesContext(connection) as queries:
+                apply_cart_operations(self.user, CartBatchSerializer().validate_operations(operations))
+            return len(queries)
+
+        self.assertEqual(batch_queries(self.products[:1]), batch_queries(self.products))
+
+    def test_missing_products_reject_the_whole_batch(self):
+        CartItem.objects.create(user=self.user, product=self.products[0], quantity=1)
+        response = self.client.patch(self.url, {'operations': [
+            {'op': 'remove', 'product_id': self.products[0].id},
+            {'op': 'add', 'product_id': 9999},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('9999', str(response.data['operations']))
+        self.assertTrue(CartItem.objects.exists())
+
+    def test_invalid_operations_are_rejected(self):
+        for operation in [
+            {'op': 'set', 'product_id': self.products[0].id},
+            {'op': 'add', 'product_id': self.products[0].id, 'quantity': 0},
+            {'op': 'replace', 'product_id': self.products[0].id},
+        ]:
+            response = self.client.patch(self.url, {'operations': [operation]}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(self.url, {'operations': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CartSummaryTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.products = [
+            Product.objects.create(
+                category='Merchandise',
+                name=f'Product {i}',
+                initial_price=400.00,
+                discounted_price=375.50,
+                description='Description',
+            )
+            for i in range(5)
+        ]
+
+    def test_totals_match_the_lines(self):
+        CartItem.objects.create(user=self.user, product=self.products[0], quantity=2)
+        CartItem.objects.create(user=self.user, product=self.products[1], quantity=3, selected_size='M')
+
+        # Lines and totals come from a single SELECT
+        with self.assertNumQueries(1):
+            cart = cart_summary(self.user)
+
+        self.assertEqual(cart.subtotal, decimal.Decimal('1877.50'))
+        self.assertEqual(cart.item_count, 5)
+        self.assertEqual(cart.total, decimal.Decimal('1927.50'))
+        self.assertTrue(cart.eligible_for_free_tshirt)
+        self.assertEqual([item.quantity for item in cart.items], [2, 3])
+
+    def test_empty_cart(self):
+        response = self.client.get(reverse('cart-view'))
+
+        self.assertEqual(response.data['items'], [])
+        self.assertEqual(response.data['subtotal'], 0)
+        self.assertEqual(response.data['total'], 50)
+        self.assertFalse(response.data['eligible_for_free_tshirt'])
+
+    def test_cart_view_queries_are_constant(self):
+        def cart_queries(products):
+            CartItem.objects.all().delete()
+            for product in products:
+                CartItem.objects.create(user=self.user, product=product, quantity=1)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('cart-view'))
+            self.assertEqual(len(response.data['items']), len(products))
+            return len(queries)
+
+        self.assertEqual(cart_queries(self.products[:1]), cart_queries(self.products))
+
+
+class CartPayloadTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('cart-view')
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(
+            category='Merchandise',
+            name='T-shirt',
+            initial_price=100.00,
+            discounted_price=90.00,
+            description='Description',
+            logo='products/logo.png',
+        )
+        CartItem.objects.create(user=self.user, product=self.product, quantity=2, selected_size='M')
+
+    def test_cart_lines_are_compact(self):
+        line = self.client.get(self.url).data['items'][0]
+
+        self.assertEqual(line['selected_size'], 'M')
+        self.assertEqual(set(line['product']), {'id', 'name', 'initial_price', 'price', 'image'})
+        self.assertEqual(line['product']['price'], '90.00')
+        self.assertTrue(line['product']['image'].endswith('/products/logo.png'))
+
+    def test_primary_image_is_the_first_gallery_image(self):
+        ProductImage.objects.create(product=self.product, image='product_images/front.png')
+        ProductImage.objects.create(product=self.product, image='product_images/back.png')
+
+        line = self.client.get(self.url).data['items'][0]
+
+        self.assertTrue(line['product']['image'].endswith('/product_images/front.png'))
+
+    def test_expand_product(self):
+        line = self.client.get(self.url, {'expand': 'product'}).data['items'][0]
+
+        self.assertEqual(line['product']['description'], 'Description')
+        self.assertIn('reviews', line['product'])
+
+
+class ConcurrentCartUpdateTest(TransactionTestCase):
+    THREADS = 6
+    TAPS = 10
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Needs a file-backed or server test database (set TEST_DATABASE_NAME)")
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.product = Product.objects.create(
+            category='Health',
+            name='Protein',
+            initial_price=100.00,
+            discounted_price=90.00,
+            description='Description',
+        )
+
+    def run_in_parallel(self, target):
+        errors = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker():
+            try:
+                client = APIClient()
+                client.force_authenticate(user=self.user)
+                barrier.wait()
+                for _ in range(self.TAPS):
+                    target(client)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_parallel_increments_are_not_lost(self):
+        item = CartItem.objects.create(user=self.user, product=self.product, quantity=1)
+        url = reverse('increase-cart-item', args=[item.pk])
+
+        self.run_in_parallel(lambda client: self.assertEqual(client.post(url).status_code, status.HTTP_200_OK))
+
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 1 + self.THREADS * self.TAPS)
+
+    def test_parallel_add_to_cart_creates_one_line(self):
+        url = reverse('add-to-cart', args=[self.product.pk])
+
+        self.run_in_parallel(lambda client: self.assertEqual(client.post(url).status_code, status.HTTP_200_OK))
+
+        self.assertEqual(CartItem.objects.get().quantity, self.THREADS * self.TAPS)
@@ -0,0 +1,115 @@
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from shop.cache import catalog_cache_stats, get_catalog_version
+from shop.checkout import adjust_order_counts
+from shop.models import Product, ProductImage, Review, Type
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework.throttling import AnonRateThrottle
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.type = Type.objects.create(name='Supplements')
+        self.product = Product.objects.create(
+            category='Health',
+            type=self.type,
+            name='Protein',
+            initial_price=100.00,
+            discounted_price=80.00,
+            description='Description',
+        )
+
+    def test_second_request_is_served_from_cache(self):
+        url = reverse('product-list')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached['X-Catalog-Cache'], 'HIT')
+        self.assertEqual(cached.content, response.content)
+
+    def test_query_string_is_part_of_the_key(self):
+        url = reverse('filter-products')
+        self.client.get(url, {'type': self.type.id})
+        response = self.client.get(url, {'type': self.type.id + 1})
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_catalog_changes_invalidate(self):
+        url = reverse('product-detail', args=[self.product.id])
+        self.client.get(url)
+
+        for change in [
+            lambda: Product.objects.filter(pk=self.product.pk).first().save(),
+            lambda: ProductImage.objects.create(product=self.product, image='product_images/a.png'),
+            lambda: Review.objects.create(product=self.product, user_name=self.user, rating=5, comment='Great'),
+            lambda: Type.objects.create(name='Apparel'),
+        ]:
+            version = get_catalog_version()
+            change()
+            self.assertNotEqual(get_catalog_version(), version)
+            self.assertEqual(self.client.get(url)['X-Catalog-Cache'], 'MISS')
+
+        self.assertEqual(self.client.get(url).json()['reviews'][0]['comment'], 'Great')
+
+    def test_catalog_changes_invalidate_again_on_commit(self):
+        url = reverse('product-detail', args=[self.product.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+            # Cached while the change is still uncommitted
+            self.client.get(url)
+            self.assertEqual(self.client.get(url)['X-Catalog-Cache'], 'HIT')
+        self.assertEqual(self.client.get(url)['X-Catalog-Cache'], 'MISS')
+
+    @override_settings(ALLOWED_HOSTS=['shop.example.com', 'api.example.com'])
+    def test_host_is_part_of_the_key(self):
+        url = reverse('product-list')
+        self.client.get(url, HTTP_HOST='shop.example.com')
+        response = self.client.get(url, HTTP_HOST='api.example.com')
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+
+    def test_hits_are_throttled(self):
+        url = reverse('product-list')
+        etag = self.client.get(url)['ETag']
+        with patch.object(AnonRateThrottle, 'THROTTLE_RATES', {'anon': '1/min'}):
+            cache.clear()
+            self.assertEqual(self.client.get(url)['X-Catalog-Cache'], 'HIT')
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(HOME_FEED_BACKGROUND=False)
+    def test_checkout_keeps_the_cache(self):
+        url = reverse('product-list')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            adjust_order_counts({self.product.pk: 2})
+        self.assertEqual(self.client.get(url)['X-Catalog-Cache'], 'HIT')
+
+    def test_bypass_header(self):
+        url = reverse('home')
+        self.client.get(url)
+        response = self.client.get(url, HTTP_X_CATALOG_CACHE='bypass')
+        self.assertEqual(response['X-Catalog-Cache'], 'BYPASS')
+
+    def test_errors_are_not_cached(self):
+        url = reverse('product-detail', args=[self.product.id + 100])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url)['X-Catalog-Cache'], 'MISS')
+
+    def test_hit_and_miss_counters(self):
+        before = catalog_cache_stats()
+        url = reverse('merchandise-product-list')
+        self.client.get(url)
+        self.client.get(url)
+        after = catalog_cache_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
@@ -47,7 +47,7 @@ class CheckoutViewTests(TestCase):
         self.assertIn('address', response.data)
         self.assertEqual(Order.objects.count(), 0)
 
-    @patch('shop.views.stripe.checkout.Session.create')
+    @patch('shop.payments.StripeGateway._create_checkout_session')
     def test_checkout_success(self, mock_stripe_create):
         # Mock Stripe Session
         mock_session = MagicMock()
@@ -78,7 +78,7 @@ class CheckoutViewTests(TestCase):
         self.assertEqual(CartItem.objects.count(), 0)
         self.assertEqual(response.data['checkout_url'], 'https://checkout.stripe.com/pay/cs_test_123')
 
-    @patch('shop.views.stripe.checkout.Session.create')
+    @patch('shop.payments.StripeGateway._create_checkout_session')
     def test_checkout_subscription_success(self, mock_stripe_create):
         # Mock Stripe Session
         mock_session = MagicMock()
@@ -179,7 +179,7 @@ class CheckoutViewTests(TestCase):
             self.fail("AttributeError raised when address is a string")
 
     # ✅ Free T-shirt Tests
-    @patch('shop.views.stripe.checkout.Session.create')
+    @patch('shop.payments.StripeGateway._create_checkout_session')
     def test_checkout_with_free_tshirt_eligible(self, mock_stripe_create):
         """Test that orders with subtotal <= 1500 get free T-shirt when size is provided"""
         mock_session = MagicMock()
@@ -223,7 +223,7 @@ class CheckoutViewTests(TestCase):
         self.assertEqual(free_item.free_item_size, 'L')
         self.assertIsNone(free_item.product)
 
-    @patch('shop.views.stripe.checkout.Session.create')
+    @patch('shop.payments.StripeGateway._create_checkout_session')
     def test_checkout_free_tshirt_missing_size(self, mock_stripe_create):
         """Test that eligible orders without size selection get error"""
         # Create cart with total >= 1500
@@ -246,7 +246,7 @@ class CheckoutViewTests(TestCase):
         self.assertIn('select your T-shirt size', str(response.data))
         self.assertEqual(Order.objects.count(), 0)
 
-    @patch('shop.views.stripe.checkout.Session.create')
+    @patch('shop.payments.StripeGateway._create_checkout_session')
     def test_checkout_free_tshirt_invalid_size(self, mock_stripe_create):
         """Test that invalid T-shirt size returns error"""
         CartItem.objects.create(user=self.user, product=self.product, quantity=20)
@@ -267,7 +267,7 @@ class CheckoutViewTests(TestCase):
         self.assertIn('free_tshirt_size', response.data)
         self.assertEqual(Order.objects.count(), 0)
 
-    @patch('shop.views.stripe.checkout.Session.create')
+    @patch('shop.payments.StripeGateway._create_checkout_session')
     def test_checkout_no_free_tshirt_for_cheap_order(self, mock_stripe_create):
         """Test that orders with subtotal < 1500 don't get free T-shirt"""
         mock_session = MagicMock()
@@ -306,7 +306,7 @@ class CheckoutViewTests(TestCase):
         self.assertEqual(order.items.count(), 1)
         self.assertFalse(order.items.filter(is_free_item=True).exists())
 
-    @patch('shop.views.stripe.checkout.Session.create')
+    @patch('shop.payments.StripeGateway._create_checkout_session')
     def test_checkout_multiple_products_with_free_tshirt(self, mock_stripe_create):
         """Test checkout with multiple products in cart total <= 1500"""
         mock_session = MagicMock()
@@ -363,7 +363,7 @@ class CheckoutViewTests(TestCase):
         
         # Verify free T-shirt
 
-    @patch('shop.views.stripe.checkout.Session.create')
+    @patch('shop.payments.StripeGateway._create_checkout_session')
     def test_guest_checkout_success(self, mock_stripe_create):
         # Mock Stripe Session
         mock_session = MagicMock()
@@ -417,7 +417,7 @@ class CheckoutViewTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('email', response.data)
 
-    @patch('shop.views.stripe.checkout.Session.create')
+    @patch('shop.payments.StripeGateway._create_checkout_session')
     def test_guest_checkout_subscription(self, mock_stripe_create):
         mock_session = MagicMock()
         mock_session.id = 'cs_test_guest_sub'
@@ -0,0 +1,100 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import User
+from shop.models import CartItem, Order, OrderItem, Product
+from rest_framework import status
+from rest_framework.test import APIClient
+from unittest.mock import patch, MagicMock
+
+
+CHECKOUT_DATA = {
+    'address': {
+        'name': 'Test User',
+        'phone': '1234567890',
+        'address': '123 Test St',
+        'type': 'home'
+    },
+}
+
+
+class CheckoutPhasesTest(TransactionTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(
+            category='Health',
+            name='Protein',
+            initial_price=100.00,
+            discounted_price=90.00,
+            description='Description',
+        )
+        CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+
+    @patch('shop.payments.StripeGateway._create_checkout_session')
+    def test_stripe_is_called_after_commit(self, mock_stripe_create):
+        def create_session(**kwargs):
+            # The pending order is already committed and no transaction is held open
+            self.assertFalse(connection.in_atomic_block)
+            self.assertTrue(Order.objects.filter(pk=kwargs['metadata']['order_id']).exists())
+            return MagicMock(id='cs_test_123', url='https://checkout.stripe.com/pay/cs_test_123')
+        mock_stripe_create.side_effect = create_session
+
+        response = self.client.post(reverse('checkout'), CHECKOUT_DATA, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get()
+        self.assertEqual(order.stripe_checkout_session_id, 'cs_test_123')
+        self.assertFalse(CartItem.objects.exists())
+
+    @patch('shop.payments.StripeGateway._create_checkout_session')
+    def test_stripe_failure_releases_the_order(self, mock_stripe_create):
+        mock_stripe_create.side_effect = Exception('Stripe is down')
+
+        response = self.client.post(reverse('checkout'), CHECKOUT_DATA, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'Stripe is down')
+        self.assertFalse(Order.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.order_count, 0)
+        self.assertEqual(CartItem.objects.count(), 1)
+
+
+class ReconcileCheckoutsTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            category='Health',
+            name='Protein',
+            initial_price=100.00,
+            discounted_price=90.00,
+            description='Description',
+            order_count=5,
+        )
+
+    def create_order(self, minutes_ago, session_id=None):
+        order = Order.objects.create(total_price=90.00, shipping_fee=50.00, stripe_checkout_session_id=session_id)
+        OrderItem.objects.create(order=order, product=self.product, price=90.00, quantity=2)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(minutes=minutes_ago))
+        return order
+
+    def test_cancels_stale_unattached_orders(self):
+        stale = self.create_order(minutes_ago=60)
+        fresh = self.create_order(minutes_ago=1)
+        attached = self.create_order(minutes_ago=60, session_id='cs_test_123')
+
+        call_command('reconcile_checkouts', '--older-than', '30', stdout=StringIO())
+
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        attached.refresh_from_db()
+        self.assertEqual(stale.status, 'Cancelled')
+        self.assertEqual(fresh.status, 'Pending')
+        self.assertEqual(attached.status, 'Pending')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.order_count, 3)
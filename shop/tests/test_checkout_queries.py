@@ -0,0 +1,146 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.models import User
+from shop.models import CartItem, Order, OrderItem, Product
+from rest_framework import status
+from rest_framework.test import APIClient
+from unittest.mock import patch, MagicMock
+
+
+@patch('shop.payments.StripeGateway._create_checkout_session')
+class CheckoutQueryCountTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('checkout')
+        self.data = {
+            'address': {
+                'name': 'Test User',
+                'phone': '1234567890',
+                'address': '123 Test St',
+                'type': 'home'
+            },
+            'free_tshirt_size': 'M'
+        }
+
+    def create_product(self, price=100.00):
+        return Product.objects.create(
+            category='Health',
+            name=f'Product {Product.objects.count()}',
+            initial_price=price,
+            discounted_price=price,
+            description='Description',
+        )
+
+    def checkout_queries(self, cart_length):
+        user = User.objects.create_user(username=f'user{cart_length}', password='password')
+        for _ in range(cart_length):
+            CartItem.objects.create(user=user, product=self.create_product(), quantity=2)
+        self.client.force_authenticate(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return len(queries)
+
+    def test_query_count_is_independent_of_cart_length(self, mock_stripe_create):
+        mock_stripe_create.return_value = MagicMock(id='cs_test', url='https://checkout.stripe.com/pay/cs_test')
+        self.assertEqual(self.checkout_queries(1), self.checkout_queries(8))
+
+    def test_order_items_and_counts(self, mock_stripe_create):
+        mock_stripe_create.return_value = MagicMock(id='cs_test', url='https://checkout.stripe.com/pay/cs_test')
+        user = User.objects.create_user(username='buyer', password='password')
+        shirt = self.create_product(price=800.00)
+        cap = self.create_product(price=50.00)
+        Product.objects.filter(pk=cap.pk).update(order_count=10)
+        CartItem.objects.create(user=user, product=shirt, quantity=1, selected_size='M', selected_color_hex='#000000')
+        CartItem.objects.create(user=user, product=shirt, quantity=1, selected_size='L', selected_color_hex='#000000')
+        CartItem.objects.create(user=user, product=cap, quantity=3)
+        self.client.force_authenticate(user=user)
+
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        order = Order.objects.get()
+        self.assertEqual(
+            sorted(OrderItem.objects.filter(order=order, is_free_item=False).values_list('product_name', 'ordered_size', 'price')),
+            [(shirt.name, 'L', 800), (shirt.name, 'M', 800), (cap.name, None, 50)],
+        )
+        self.assertTrue(OrderItem.objects.filter(order=order, is_free_item=True, free_item_size='M').exists())
+        shirt.refresh_from_db()
+        cap.refresh_from_db()
+        self.assertEqual(shirt.order_count, 2)
+        self.assertEqual(cap.order_count, 13)
+        self.assertEqual(len(response.data['order']['items']), 4)
+
+
+@patch('shop.payments.StripeGateway._create_checkout_session')
+class GuestCheckoutResolutionTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('checkout')
+        self.products = [
+            Product.objects.create(
+                category='Health',
+                name=f'Product {i}',
+                initial_price=100.00,
+                discounted_price=100.00,
+                description='Description',
+            )
+            for i in range(6)
+        ]
+
+    def payload(self, cart_items):
+        return {
+            'cart_items': cart_items,
+            'address': {
+                'name': 'Guest User',
+                'phone': '0412345678',
+                'address': '123 Guest St',
+                'type': 'home'
+            },
+            'email': 'guest@example.com',
+        }
+
+    def checkout_queries(self, products):
+        cart_items = [{'product_id': p.id, 'quantity': 1} for p in products]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.payload(cart_items), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return len(queries)
+
+    def test_query_count_is_independent_of_cart_length(self, mock_stripe_create):
+        mock_stripe_create.return_value = MagicMock(id='cs_test', url='https://checkout.stripe.com/pay/cs_test')
+        self.assertEqual(self.checkout_queries(self.products[:1]), self.checkout_queries(self.products))
+
+    def test_duplicate_lines_are_merged(self, mock_stripe_create):
+        mock_stripe_create.return_value = MagicMock(id='cs_test', url='https://checkout.stripe.com/pay/cs_test')
+        product = self.products[0]
+        cart_items = [{'product_id': product.id, 'quantity': 1}, {'product_id': product.id, 'quantity': 2}]
+
+        response = self.client.post(self.url, self.payload(cart_items), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        item = OrderItem.objects.get()
+        self.assertEqual(item.quantity, 3)
+        self.assertEqual(Order.objects.get().total_price, 300)
+
+    def test_missing_products_are_reported_together(self, mock_stripe_create):
+        cart_items = [
+            {'product_id': self.products[0].id, 'quantity': 1},
+            {'product_id': 9998, 'quantity': 1},
+            {'product_id': 9999, 'quantity': 1},
+        ]
+
+        response = self.client.post(self.url, self.payload(cart_items), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('9998, 9999', str(response.data['cart_items']))
+        self.assertFalse(Order.objects.exists())
+        mock_stripe_create.assert_not_called()
+
+    def test_empty_cart_is_rejected(self, mock_stripe_create):
+        response = self.client.post(self.url, self.payload([]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cart_items', response.data)
@@ -0,0 +1,86 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+from shop.models import Order, Product
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+class CatalogConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(
+            category='Health',
+            name='Protein',
+            initial_price=100.00,
+            discounted_price=80.00,
+            description='Description',
+        )
+
+    def test_home_not_modified(self):
+        url = reverse('home')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_product_detail_etag_changes_with_catalog(self):
+        url = reverse('product-detail', args=[self.product.id])
+        etag = self.client.get(url)['ETag']
+
+        self.product.name = 'Whey Protein'
+        self.product.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['name'], 'Whey Protein')
+
+    def test_etag_is_per_url(self):
+        home = self.client.get(reverse('home'))['ETag']
+        detail = self.client.get(reverse('product-detail', args=[self.product.id]))['ETag']
+        self.assertNotEqual(home, detail)
+
+
+class OrderConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.order = Order.objects.create(user=self.user, total_price=100.00, shipping_fee=50.00)
+
+    def test_order_list_not_modified(self):
+        url = reverse('order-list')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_order_list_etag_changes_on_status_change(self):
+        url = reverse('order-list')
+        etag = self.client.get(url)['ETag']
+
+        self.client.post(reverse('cancel-order', args=[self.order.id]))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_order_list_etag_is_per_user(self):
+        etag = self.client.get(reverse('order-list'))['ETag']
+        other = User.objects.create_user(username='other', password='password')
+        self.client.force_authenticate(user=other)
+        response = self.client.get(reverse('order-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_order_detail_not_modified(self):
+        url = reverse('order-detail', args=[self.order.id])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -0,0 +1,85 @@
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from shop.cache import catalog_cache
+from shop.checkout import adjust_order_counts
+from shop.home import FEED_KEY
+from shop.models import Product, Review
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework.throttling import AnonRateThrottle
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+@override_settings(HOME_FEED_BACKGROUND=False)
+class HomeFeedTest(TestCase):
+    def setUp(self):
+        catalog_cache().delete(FEED_KEY)
+        self.client = APIClient()
+        self.url = reverse('home')
+        self.user = User.objects.create_user(username='reviewer', first_name='Ada', password='password')
+        self.products = [
+            Product.objects.create(
+                category='Health',
+                name=f'Product {i}',
+                initial_price=100.00,
+                discounted_price=80.00,
+                description='Description',
+            )
+            for i in range(6)
+        ]
+        Review.objects.create(product=self.products[0], user_name=self.user, rating=5, comment='Great')
+
+    def test_feed_is_served_without_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first['X-Catalog-Cache'], 'MISS')
+
+        token = RefreshToken.for_user(self.user).access_token
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Catalog-Cache'], 'HIT')
+        self.assertEqual(response.content, first.content)
+        data = response.json()
+        self.assertEqual(len(data['products']), 4)
+        self.assertEqual(data['reviews'][0]['user_name'], 'Ada')
+
+    def test_signed_in_users_are_not_anonymous_for_throttling(self):
+        token = RefreshToken.for_user(self.user).access_token
+        with patch.object(AnonRateThrottle, 'THROTTLE_RATES', {'anon': '1/min'}):
+            cache.clear()
+            for _ in range(2):
+                response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {token}')
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.client.get(self.url)
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_changes_rebuild_the_feed_after_commit(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            adjust_order_counts({self.products[0].pk: 3})
+        self.assertEqual(self.client.get(self.url).json()['products'][0]['name'], 'Product 0')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Grace'
+            self.user.save()
+        self.assertEqual(self.client.get(self.url).json()['reviews'][0]['user_name'], 'Grace')
+
+    def test_stale_feed_is_served_until_rebuilt(self):
+        self.client.get(self.url)
+        Product.objects.filter(pk=self.products[0].pk).update(order_count=10)
+        self.assertNotEqual(self.client.get(self.url).json()['products'][0]['name'], 'Product 0')
+
+        out = StringIO()
+        call_command('rebuild_home_feed', stdout=out)
+        self.assertIn('Rebuilt home feed', out.getvalue())
+        self.assertEqual(self.client.get(self.url).json()['products'][0]['name'], 'Product 0')
+
+    def test_login_does_not_look_up_reviews(self):
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['last_login'])
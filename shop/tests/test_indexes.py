@@ -0,0 +1,66 @@
+import unittest
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.contrib.auth.models import User
+from shop.models import CartItem, Order, Product, Review
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+class HotQueryIndexTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.product = Product.objects.create(
+            category='Health',
+            name='Protein',
+            initial_price=100.00,
+            discounted_price=80.00,
+            description='Description',
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"Query does not use {index_name}:\n{plan}")
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, f"Query sorts without an index:\n{plan}")
+
+    def test_category_listing(self):
+        self.assertUsesIndex(Product.objects.filter(category='Health').order_by('id'), 'shop_product_category_idx')
+
+    def test_home_popular_products(self):
+        self.assertUsesIndex(Product.objects.order_by('-order_count', '-created_at')[:4], 'shop_product_popular_idx')
+
+    def test_subscription_price_lookup(self):
+        self.assertUsesIndex(Product.objects.filter(stripe_subscription_price_id='price_123'), 'shop_product_sub_price_idx')
+
+    def test_order_history(self):
+        self.assertUsesIndex(Order.objects.filter(user=self.user).order_by('-created_at'), 'shop_order_user_created_idx')
+
+    def test_checkout_session_lookup(self):
+        self.assertUsesIndex(Order.objects.filter(stripe_checkout_session_id='cs_123'), 'shop_order_session_idx')
+
+    def test_duplicate_review_check(self):
+        # The unique constraint is backed by an automatic index on SQLite
+        queryset = Review.objects.filter(user_name=self.user, product=self.product)
+        self.assertUsesIndex(queryset, 'sqlite_autoindex_shop_review')
+
+
+class UniqueConstraintTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.product = Product.objects.create(
+            category='Health',
+            name='Protein',
+            initial_price=100.00,
+            discounted_price=80.00,
+            description='Description',
+        )
+
+    def test_one_review_per_user_and_product(self):
+        Review.objects.create(product=self.product, user_name=self.user, rating=5, comment='Great')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Review.objects.create(product=self.product, user_name=self.user, rating=1, comment='Changed my mind')
+
+    def test_one_cart_line_per_variant(self):
+        CartItem.objects.create(user=self.user, product=self.product, selected_size='M', selected_color_hex='#FF0000')
+        CartItem.objects.create(user=self.user, product=self.product, selected_size='L', selected_color_hex='#FF0000')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartItem.objects.create(user=self.user, product=self.product, selected_size='M', selected_color_hex='#FF0000')
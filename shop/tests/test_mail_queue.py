@@ -0,0 +1,162 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import User
+from shop.mail import MailWorker, queue_mail
+from shop.management.periodic import PeriodicCommand
+from shop.models import Order, OutboundEmail
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class QueueMailTest(TestCase):
+    def test_message_is_queued_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            queue_mail('Subject', 'Body', ['customer@example.com'])
+            self.assertFalse(OutboundEmail.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        message = OutboundEmail.objects.get()
+        self.assertEqual(message.status, 'Queued')
+        self.assertEqual(message.recipients, ['customer@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_contact_message_does_not_send_inline(self):
+        data = {
+            'name': 'Jane',
+            'whatsapp': '0412345678',
+            'email': 'jane@example.com',
+            'project_details': 'A new store',
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('contact-message'), data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.get().subject, 'New Contact Message Received')
+
+    @override_settings(STRIPE_WEBHOOK_BACKGROUND=False)
+    @patch('shop.views.stripe.Webhook.construct_event')
+    def test_webhook_queues_confirmation_emails(self, mock_construct_event):
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='password')
+        order = Order.objects.create(user=user, email='buyer@example.com', total_price=100, shipping_fee=0)
+        mock_construct_event.return_value = {
+            'type': 'checkout.session.completed',
+            'data': {'object': {'client_reference_id': str(order.id)}},
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post(reverse('stripe-webhook'), {}, format='json', HTTP_STRIPE_SIGNATURE='sig')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    MAIL_QUEUE_MAX_ATTEMPTS=2,
+    MAIL_QUEUE_RETRY_BACKOFF=30,
+)
+class MailWorkerTest(TestCase):
+    def queue(self, count):
+        return OutboundEmail.objects.bulk_create(
+            OutboundEmail(subject=f'Subject {i}', body='Body', from_email='shop@example.com', recipients=[f'user{i}@example.com'])
+            for i in range(count)
+        )
+
+    def test_worker_sends_due_messages_in_batches(self):
+        self.queue(5)
+        worker = MailWorker(batch_size=2, threads=2)
+        try:
+            self.assertEqual(worker.run_once(), (2, 0))
+            self.assertEqual(worker.run_once(), (2, 0))
+            self.assertEqual(worker.run_once(), (1, 0))
+            self.assertEqual(worker.run_once(), (0, 0))
+        finally:
+            worker.close()
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutboundEmail.objects.exclude(status='Sent').exists())
+
+    def test_worker_reuses_connection(self):
+        self.queue(3)
+        worker = MailWorker(batch_size=1)
+        try:
+            with patch('shop.mail.get_connection', wraps=lambda: EmailBackend()) as mock_get_connection:
+                for _ in range(3):
+                    worker.run_once()
+        finally:
+            worker.close()
+        self.assertEqual(mock_get_connection.call_count, 1)
+
+    def test_failed_message_is_retried_with_backoff(self):
+        message = self.queue(1)[0]
+        worker = MailWorker()
+        try:
+            with patch.object(EmailBackend, 'send_messages', side_effect=ConnectionError('smtp down')):
+                self.assertEqual(worker.run_once(), (0, 1))
+            message.refresh_from_db()
+            self.assertEqual(message.status, 'Queued')
+            self.assertEqual(message.attempts, 1)
+            self.assertEqual(message.last_error, 'smtp down')
+            self.assertGreater(message.next_attempt_at, timezone.now() + timedelta(seconds=20))
+
+            # Not due yet
+            self.assertEqual(worker.run_once(), (0, 0))
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            with patch.object(EmailBackend, 'send_messages', side_effect=ConnectionError('smtp down')):
+                worker.run_once()
+        finally:
+            worker.close()
+        message.refresh_from_db()
+        self.assertEqual(message.status, 'Failed')
+        self.assertEqual(message.attempts, 2)
+
+    def test_stale_claims_are_picked_up_again(self):
+        message = self.queue(1)[0]
+        OutboundEmail.objects.update(status='Sending', claimed_at=timezone.now() - timedelta(hours=1))
+        worker = MailWorker()
+        try:
+            self.assertEqual(worker.run_once(), (1, 0))
+        finally:
+            worker.close()
+        message.refresh_from_db()
+        self.assertEqual(message.status, 'Sent')
+
+    def test_run_mail_worker_once(self):
+        self.queue(3)
+        out = StringIO()
+        call_command('run_mail_worker', '--once', '--threads', '2', stdout=out)
+        self.assertIn('Sent 3 emails, 0 failed', out.getvalue())
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class PeriodicCommandTest(TestCase):
+    def test_repeats_busy_work_and_sleeps_when_idle(self):
+        results = iter([True, True, False, False])
+        calls = []
+
+        def work():
+            calls.append(1)
+            return next(results)
+
+        # Ctrl-C during the second sleep ends the loop quietly
+        with patch('shop.management.periodic.time.sleep', side_effect=[None, KeyboardInterrupt]) as mock_sleep:
+            PeriodicCommand().run_periodically(work, 30)
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_runs_once_without_interval(self):
+        calls = []
+        PeriodicCommand().run_periodically(lambda: calls.append(1), None)
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,95 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import User
+from shop.models import Order, OrderAddress, OrderItem, Product, ProductImage, Review
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+class OrderHistoryTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('order-list')
+        self.user = User.objects.create_user(username='buyer', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.products = []
+        for i in range(3):
+            product = Product.objects.create(
+                category='Merchandise',
+                name=f'Product {i}',
+                initial_price=100.00,
+                discounted_price=100.00,
+                description='Description',
+            )
+            ProductImage.objects.create(product=product, image=f'product_images/{i}.png')
+            Review.objects.create(product=product, user_name=self.user, rating=5, comment='Great')
+            self.products.append(product)
+
+    def place_orders(self, count, created_at=None):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, total_price=300, shipping_fee=50)
+            if created_at:
+                Order.objects.filter(pk=order.pk).update(created_at=created_at, updated_at=timezone.now())
+            OrderAddress.objects.create(order=order, name='Buyer', phone='0412345678', address='1 Main St', type='home')
+            for product in Product.objects.with_primary_image().filter(pk__in=[p.pk for p in self.products]):
+                OrderItem.from_product(order, product, 2, size='M').save()
+
+    def test_orders_include_their_address(self):
+        self.place_orders(1)
+
+        order = self.client.get(self.url).data['results'][0]
+
+        self.assertEqual(order['address']['address'], '1 Main St')
+        self.assertEqual(len(order['items']), 3)
+
+    def test_cursor_pages_do_not_overlap(self):
+        # Same timestamp everywhere, so only the id tie-breaker orders them
+        self.place_orders(5, created_at=timezone.now())
+
+        first = self.client.get(self.url, {'page_size': 3}).data
+        second = self.client.get(first['next']).data
+
+        ids = [order['id'] for order in first['results'] + second['results']]
+        self.assertEqual(ids, list(Order.objects.order_by('-id').values_list('id', flat=True)))
+        self.assertIsNone(second['next'])
+
+    def test_summary_view(self):
+        self.place_orders(1)
+
+        order = self.client.get(self.url, {'view': 'summary'}).data['results'][0]
+
+        self.assertEqual(order['item_count'], 6)
+        self.assertEqual(len(order['thumbnails']), 3)
+        self.assertNotIn('items', order)
+
+    def test_queries_do_not_grow_with_history(self):
+        def history_queries(params):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        self.place_orders(1)
+        full, summary = history_queries({}), history_queries({'view': 'summary'})
+        self.place_orders(6)
+        self.assertEqual(history_queries({}), full)
+        self.assertEqual(history_queries({'view': 'summary'}), summary)
+
+    def test_history_never_reads_the_catalog(self):
+        self.place_orders(2)
+        self.products[0].delete()
+        Product.objects.filter(pk=self.products[1].pk).update(name='Renamed', discounted_price=1)
+
+        with CaptureQueriesContext(connection) as queries:
+            orders = self.client.get(self.url).data['results']
+
+        self.assertFalse(any('shop_product' in query['sql'] for query in queries))
+        items = orders[0]['items']
+        self.assertEqual([item['product_name'] for item in items], ['Product 0', 'Product 1', 'Product 2'])
+        self.assertEqual(items[0]['product'], None)
+        self.assertEqual(items[1]['price'], '100.00')
+        self.assertEqual(items[1]['ordered_size'], 'M')
+        self.assertTrue(items[0]['image'].endswith('/product_images/0.png'))
@@ -0,0 +1,130 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from shop.models import CartItem, Order, Product, UserSubscription
+from shop.payments import FakeGateway, StripeGateway, get_gateway
+import stripe
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+@override_settings(PAYMENT_GATEWAY='shop.payments.FakeGateway')
+class FakeGatewayFlowTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(
+            category='Health',
+            name='Protein',
+            initial_price=100.00,
+            discounted_price=100.00,
+            description='Description',
+            stripe_subscription_price_id='price_sub',
+        )
+        self.gateway = get_gateway()
+        self.gateway.metrics.reset()
+
+    def test_get_gateway_follows_settings(self):
+        self.assertIsInstance(self.gateway, FakeGateway)
+        self.assertIs(get_gateway(), self.gateway)
+
+    def test_checkout_without_network(self):
+        CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+        data = {'address': {'name': 'Buyer', 'phone': '0412345678', 'address': '1 Main St', 'type': 'home'}}
+
+        response = self.client.post(reverse('checkout'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get()
+        session = self.gateway.sessions[order.stripe_checkout_session_id]
+        self.assertEqual(response.data['checkout_url'], session.url)
+        self.assertEqual(session.params['client_reference_id'], str(order.id))
+        self.assertEqual(self.gateway.metrics.snapshot()['create_checkout_session']['calls'], 1)
+
+    def test_subscription_quantity_and_cancel(self):
+        subscription = self.gateway.add_subscription('sub_1', [('price_sub', 1)])
+        item_id = subscription['items']['data'][0]['id']
+        user_subscription = UserSubscription.objects.create(
+            user=self.user, product=self.product, stripe_subscription_id='sub_1', stripe_subscription_item_id=item_id
+        )
+
+        response = self.client.patch(reverse('subscription-update', args=[user_subscription.pk]), {'action': 'increment'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(subscription['items']['data'][0]['quantity'], 2)
+
+        response = self.client.delete(reverse('subscription-cancel', args=[user_subscription.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(subscription['items']['data'], [])
+
+    def test_unknown_item_surfaces_as_stripe_error(self):
+        user_subscription = UserSubscription.objects.create(
+            user=self.user, product=self.product, stripe_subscription_id='sub_1', stripe_subscription_item_id='si_missing'
+        )
+
+        response = self.client.delete(reverse('subscription-cancel', args=[user_subscription.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.gateway.metrics.snapshot()['delete_subscription_item']['errors'], 1)
+
+    def test_stats_are_admin_only(self):
+        response = self.client.get(reverse('payment-gateway-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=User.objects.create_superuser(username='admin', password='password'))
+        response = self.client.get(reverse('payment-gateway-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['gateway'], 'fake')
+
+
+class GatewayAsyncTest(TestCase):
+    def test_fake_async_variants(self):
+        gateway = FakeGateway(latency=0.01)
+
+        async def run():
+            sessions = await asyncio.gather(*[
+                gateway.acreate_checkout_session(mode='subscription', line_items=[{'price': 'price_1', 'quantity': 1}])
+                for _ in range(5)
+            ])
+            subscription = await gateway.aretrieve_subscription(sessions[0].subscription)
+            item_id = subscription['items']['data'][0]['id']
+            await gateway.amodify_subscription_item(item_id, quantity=3)
+            return sessions, subscription
+
+        sessions, subscription = asyncio.run(run())
+
+        self.assertEqual(len({session.id for session in sessions}), 5)
+        self.assertEqual(subscription['items']['data'][0]['quantity'], 3)
+        stats = gateway.metrics.snapshot()
+        self.assertEqual(stats['create_checkout_session']['calls'], 5)
+        self.assertGreaterEqual(stats['create_checkout_session']['p50_ms'], 10)
+
+    def test_stripe_gateway_configures_pooled_client(self):
+        default_http_client = stripe.default_http_client
+        gateway = StripeGateway(api_key='sk_test_x', connect_timeout=3, read_timeout=15, max_retries=4, pool_size=7)
+
+        requestor = gateway.client._requestor
+        self.assertIs(requestor._client, gateway.http_client)
+        self.assertEqual(requestor._options.api_key, 'sk_test_x')
+        self.assertEqual(requestor._options.max_network_retries, 4)
+        self.assertEqual(gateway.http_client._timeout, (3, 15))
+        self.assertEqual(gateway.http_client._session.get_adapter('https://api.stripe.com')._pool_maxsize, 7)
+        # The stripe module globals are left alone
+        self.assertIs(stripe.default_http_client, default_http_client)
+
+    def test_stripe_gateway_async_and_sync_calls(self):
+        gateway = StripeGateway(api_key='sk_test_x')
+        sessions = gateway.client.v1.checkout.sessions
+
+        with patch.object(sessions, 'create', return_value=MagicMock(id='cs_sync')) as mock_create, \
+                patch.object(sessions, 'create_async', new_callable=AsyncMock, return_value=MagicMock(id='cs_async')):
+            self.assertEqual(gateway.create_checkout_session(mode='payment').id, 'cs_sync')
+            if gateway.async_client is not None:
+                self.assertEqual(asyncio.run(gateway.acreate_checkout_session(mode='payment')).id, 'cs_async')
+            else:
+                self.assertEqual(asyncio.run(gateway.acreate_checkout_session(mode='payment')).id, 'cs_sync')
+
+        mock_create.assert_any_call({'mode': 'payment'})
+        self.assertEqual(gateway.metrics.snapshot()['create_checkout_session']['calls'], 2)
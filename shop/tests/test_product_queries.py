@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+from shop.models import Product, ProductImage, Review, Type
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+class ProductListingQueryCountTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.type = Type.objects.create(name='Supplements')
+        self.users = [
+            User.objects.create_user(username=f'reviewer{i}', password='password')
+            for i in range(3)
+        ]
+
+    def create_products(self, count, category='Health'):
+        for i in range(count):
+            product = Product.objects.create(
+                category=category,
+                type=self.type,
+                name=f'Product {Product.objects.count()}',
+                initial_price=100.00,
+                discounted_price=80.00,
+                description='Description',
+            )
+            ProductImage.objects.create(product=product, image='product_images/a.png')
+            ProductImage.objects.create(product=product, image='product_images/b.png')
+            for user in self.users:
+                Review.objects.create(product=product, user_name=user, rating=4, comment='Good')
+
+    def assertConstantQueries(self, url, params=None, category='Health'):
+        self.create_products(2, category=category)
+        with self.assertNumQueries(3):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.create_products(8, category=category)
+        with self.assertNumQueries(3):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_health_listing_query_count(self):
+        response = self.assertConstantQueries(reverse('product-list'))
+        self.assertEqual(response.data['count'], 10)
+        self.assertEqual(response.data['results'][0]['review_count'], 3)
+        self.assertEqual(response.data['results'][0]['average_rating'], 4.0)
+        self.assertNotIn('reviews', response.data['results'][0])
+
+    def test_merchandise_listing_query_count(self):
+        self.assertConstantQueries(reverse('merchandise-product-list'), category='Merchandise')
+
+    def test_type_filter_query_count(self):
+        self.assertConstantQueries(reverse('filter-products'), {'type': self.type.id})
+
+    def test_search_query_count(self):
+        self.assertConstantQueries(reverse('product-search'), {'q': 'product'})
+
+
+class ProductListingPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        for i in range(self.page_size + 5):
+            Product.objects.create(
+                category='Health',
+                name=f'Product {i}',
+                initial_price=100.00,
+                discounted_price=80.00,
+                description='Description',
+            )
+
+    def test_listing_honors_page_size(self):
+        response = self.client.get(reverse('product-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], self.page_size + 5)
+        self.assertEqual(len(response.data['results']), self.page_size)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_listing_limit_offset(self):
+        response = self.client.get(reverse('product-list'), {'limit': 2, 'offset': self.page_size + 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['name'] for p in response.data['results']], [f'Product {self.page_size + 4}'])
+        self.assertIsNone(response.data['next'])
@@ -0,0 +1,135 @@
+import math
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from shop.models import Order, OrderItem, Product, ProductRecommendation, RecommendationState
+from shop.recommendations import STATE_PK, CoPurchaseMatrix, rebuild_recommendations, update_recommendations
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+class CoPurchaseMatrixTest(SimpleTestCase):
+    def setUp(self):
+        self.matrix = CoPurchaseMatrix()
+        for basket in [[1, 2], [1, 2, 3], [1, 3], [2, 4], [1, 1, 2]]:
+            self.matrix.add_basket(basket)
+
+    def test_counts(self):
+        self.assertEqual(self.matrix.baskets, 5)
+        self.assertEqual(self.matrix.neighbors(1, metric='cosine')[0][0], 2)
+        self.assertEqual(self.matrix.neighbors(1)[0][2], 3)
+        self.assertEqual(self.matrix.neighbors(9), [])
+
+    def test_cosine_and_lift(self):
+        # n_1 = 4, n_2 = 4, n_4 = 1, c_12 = 3, c_24 = 1
+        self.assertAlmostEqual(dict((p, s) for p, s, _ in self.matrix.neighbors(1))[2], 3 / math.sqrt(16))
+        lift = {p: s for p, s, _ in self.matrix.neighbors(2, metric='lift')}
+        self.assertAlmostEqual(lift[4], 1 * 5 / (4 * 1))
+        self.assertEqual(list(lift)[0], 4)
+
+    def test_min_support_and_k(self):
+        self.assertEqual([p for p, _, _ in self.matrix.neighbors(2, min_support=2)], [1])
+        self.assertEqual(len(self.matrix.neighbors(2, k=1)), 1)
+
+    def test_round_trip(self):
+        restored = CoPurchaseMatrix.from_bytes(self.matrix.to_bytes())
+        self.assertEqual(restored.baskets, self.matrix.baskets)
+        self.assertEqual(restored.top_k(metric='lift'), self.matrix.top_k(metric='lift'))
+
+        restored.add_basket([3, 4])
+        self.matrix.add_basket([3, 4])
+        self.assertEqual(restored.top_k(), self.matrix.top_k())
+
+
+@override_settings(RECOMMENDATION_TOP_K=3)
+class RecommendationPersistenceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='password')
+        self.products = [
+            Product.objects.create(
+                category='Health',
+                name=f'Product {i}',
+                initial_price=100.00,
+                discounted_price=100.00,
+                description='Description',
+            )
+            for i in range(5)
+        ]
+
+    def place_order(self, *indexes, paid=True):
+        order = Order.objects.create(user=self.user, total_price=100, shipping_fee=50, is_paid=paid)
+        OrderItem.objects.bulk_create([OrderItem.from_product(order, self.products[i], 1) for i in indexes])
+        return order
+
+    def stored(self):
+        return {
+            (row.product_id, row.recommended_id): (round(row.score, 6), row.co_purchases)
+            for row in ProductRecommendation.objects.all()
+        }
+
+    def test_incremental_update_matches_full_rebuild(self):
+        self.place_order(0, 1)
+        self.place_order(0, 1, 2)
+        self.place_order(3, 4, paid=False)
+        rebuild_recommendations()
+        self.assertEqual(RecommendationState.objects.get().baskets, 2)
+
+        self.place_order(0, 2)
+        self.place_order(2, 3)
+        self.place_order(1, 2, 4)
+        self.assertEqual(update_recommendations(), 3)
+        self.assertEqual(update_recommendations(), 0)
+        incremental = self.stored()
+
+        rebuild_recommendations()
+        self.assertEqual(self.stored(), incremental)
+        self.assertEqual(RecommendationState.objects.get().baskets, 5)
+
+    def test_first_update_builds_everything(self):
+        self.place_order(0, 1)
+        out = StringIO()
+        call_command('update_recommendations', stdout=out)
+        self.assertIn('Added 1 orders', out.getvalue())
+        self.assertTrue(Order.objects.get().recommendations_indexed)
+        self.assertEqual(self.stored()[(self.products[0].pk, self.products[1].pk)], (1.0, 1))
+
+        update_recommendations()
+        self.assertEqual(RecommendationState.objects.get().pk, STATE_PK)
+
+    def test_deleted_products_are_skipped(self):
+        self.place_order(0, 1, 2)
+        rebuild_recommendations()
+        self.products[2].delete()
+        self.place_order(0, 1)
+
+        update_recommendations()
+
+        self.assertEqual(
+            set(ProductRecommendation.objects.filter(product=self.products[0]).values_list('recommended_id', flat=True)),
+            {self.products[1].pk},
+        )
+
+    def test_also_bought_endpoint(self):
+        self.place_order(0, 1)
+        self.place_order(0, 1)
+        self.place_order(0, 2)
+        rebuild_recommendations()
+
+        response = APIClient().get(reverse('product-also-bought', args=[self.products[0].pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([product['name'] for product in response.json()], ['Product 1', 'Product 2'])
+
+    def test_also_bought_unknown_product(self):
+        url = reverse('product-also-bought', args=[self.products[0].pk])
+        self.assertEqual(APIClient().get(url).json(), [])
+
+        missing = reverse('product-also-bought', args=[self.products[-1].pk + 100])
+        self.assertEqual(APIClient().get(missing).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_recommendations', '--lines', '2000', '--products', '200', stdout=out)
+        self.assertIn('2000', out.getvalue().splitlines()[1])
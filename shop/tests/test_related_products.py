@@ -0,0 +1,107 @@
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+from shop.models import Order, OrderItem, Product, ProductImage, RelatedProduct, Review, Type
+from shop.related import refresh_related_products
+from shop.webhooks import handle_checkout_session_completed
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+class RelatedProductsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='buyer', password='password')
+        shakes = Type.objects.create(name='Shakes')
+        self.protein = self.create_product('Protein', 'Health', shakes)
+        self.shaker = self.create_product('Shaker', 'Merchandise')
+        self.whey = self.create_product('Whey', 'Health', shakes)
+        self.vitamins = self.create_product('Vitamins', 'Health')
+        self.cap = self.create_product('Cap', 'Merchandise')
+
+    def create_product(self, name, category, type=None):
+        product = Product.objects.create(
+            category=category,
+            type=type,
+            name=name,
+            initial_price=100.00,
+            discounted_price=100.00,
+            description='Description',
+        )
+        ProductImage.objects.create(product=product, image=f'product_images/{name}.png')
+        return product
+
+    def place_order(self, *products, paid=True):
+        order = Order.objects.create(user=self.user, total_price=100, shipping_fee=50, is_paid=paid)
+        OrderItem.objects.bulk_create([OrderItem.from_product(order, product, 1) for product in products])
+        return order
+
+    def related_names(self, product):
+        return list(
+            RelatedProduct.objects.filter(product=product).order_by('-score').values_list('related__name', flat=True)
+        )
+
+    def test_co_purchases_outrank_similarity(self):
+        self.place_order(self.protein, self.shaker)
+        self.place_order(self.protein, self.shaker, self.cap)
+        self.place_order(self.protein, self.cap, paid=False)
+
+        refresh_related_products([self.protein.pk])
+
+        self.assertEqual(self.related_names(self.protein), ['Shaker', 'Cap', 'Whey', 'Vitamins'])
+        self.assertEqual(RelatedProduct.objects.get(product=self.protein, related=self.shaker).co_purchases, 2)
+
+    def test_paid_order_refreshes_its_products(self):
+        refresh_related_products([self.protein.pk, self.shaker.pk, self.vitamins.pk])
+        self.assertEqual(self.related_names(self.shaker), ['Cap'])
+
+        order = self.place_order(self.shaker, self.vitamins, paid=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            handle_checkout_session_completed({'client_reference_id': str(order.id)})
+
+        self.assertEqual(self.related_names(self.shaker), ['Vitamins', 'Cap'])
+        self.assertEqual(self.related_names(self.vitamins)[0], 'Shaker')
+        # Products outside the order keep their lists
+        self.assertEqual(self.related_names(self.protein), ['Whey', 'Vitamins'])
+
+    def test_type_change_refreshes_affected_lists(self):
+        refresh_related_products([self.protein.pk, self.whey.pk])
+        self.assertEqual(self.related_names(self.protein)[0], 'Whey')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.whey.type = None
+            self.whey.category = 'Merchandise'
+            self.whey.save()
+
+        self.assertNotIn('Whey', self.related_names(self.protein))
+        self.assertEqual(self.related_names(self.whey), ['Cap', 'Shaker'])
+
+    @patch('shop.signals.refresh_regrouped_product')
+    def test_other_edits_do_not_refresh(self, mock_refresh):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.whey.name = 'Whey Isolate'
+            self.whey.save()
+        mock_refresh.assert_not_called()
+
+    def test_detail_view_uses_three_queries(self):
+        Review.objects.create(product=self.protein, user_name=self.user, rating=5, comment='Great')
+        self.place_order(self.protein, self.cap)
+        call_command('rebuild_related_products', stdout=StringIO())
+
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('product-detail', args=[self.protein.pk]), HTTP_X_CATALOG_CACHE='bypass'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['reviews'][0]['comment'], 'Great')
+        self.assertEqual([p['name'] for p in data['related_products']], ['Cap', 'Whey', 'Vitamins'])
+        self.assertEqual(len(data['related_products'][0]['images']), 1)
+
+    def test_missing_product(self):
+        response = self.client.get(reverse('product-detail', args=[9999]), HTTP_X_CATALOG_CACHE='bypass')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
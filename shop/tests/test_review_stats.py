@@ -1,7 +1,10 @@
+from io import StringIO
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
-from shop.models import Product, Review, Type
+from shop.models import Product, ProductRatingSummary, Review, Type
+from shop.reviews import review_stats_for, summary_review_stats
 from rest_framework import status
 from rest_framework.test import APIClient
 
@@ -31,12 +34,13 @@ class ProductReviewStatsTest(TestCase):
         self.assertEqual(response.data['star_counts']['5_star'], 0)
 
     def test_get_review_stats_with_reviews(self):
-        # Create reviews
-        Review.objects.create(product=self.product, user_name=self.user, rating=5, comment="Great")
-        Review.objects.create(product=self.product, user_name=self.user, rating=5, comment="Excellent")
-        Review.objects.create(product=self.product, user_name=self.user, rating=4, comment="Good")
-        Review.objects.create(product=self.product, user_name=self.user, rating=3, comment="Average")
-        Review.objects.create(product=self.product, user_name=self.user, rating=1, comment="Bad")
+        # Create reviews; each user may review a product only once
+        users = [User.objects.create_user(username=f'reviewer{i}', password='password') for i in range(5)]
+        Review.objects.create(product=self.product, user_name=users[0], rating=5, comment="Great")
+        Review.objects.create(product=self.product, user_name=users[1], rating=5, comment="Excellent")
+        Review.objects.create(product=self.product, user_name=users[2], rating=4, comment="Good")
+        Review.objects.create(product=self.product, user_name=users[3], rating=3, comment="Average")
+        Review.objects.create(product=self.product, user_name=users[4], rating=1, comment="Bad")
 
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -62,3 +66,130 @@ class ProductReviewStatsTest(TestCase):
         url = reverse('product-review-stats', args=[999])
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductRatingSummaryTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.other_user = User.objects.create_user(username='otheruser', password='testpassword')
+        self.product = Product.objects.create(
+            category='Health',
+            name='Test Product',
+            initial_price=100.00,
+            discounted_price=80.00,
+            description='Test Description',
+        )
+        self.url = reverse('product-review-stats', args=[self.product.id])
+
+    def summary(self):
+        return ProductRatingSummary.objects.get(product=self.product)
+
+    def test_summary_created_with_product(self):
+        summary = self.summary()
+        self.assertEqual(summary.review_count, 0)
+        self.assertEqual(summary.average_rating, 0)
+
+    def test_summary_tracks_create_edit_and_delete(self):
+        review = Review.objects.create(product=self.product, user_name=self.user, rating=5, comment="Great")
+        Review.objects.create(product=self.product, user_name=self.other_user, rating=2, comment="Meh")
+        summary = self.summary()
+        self.assertEqual((summary.review_count, summary.rating_sum, summary.star_5, summary.star_2), (2, 7, 1, 1))
+
+        review.rating = 3
+        review.save()
+        summary = self.summary()
+        self.assertEqual((summary.review_count, summary.rating_sum, summary.star_5, summary.star_3), (2, 5, 0, 1))
+
+        review.delete()
+        summary = self.summary()
+        self.assertEqual((summary.review_count, summary.rating_sum, summary.star_3), (1, 2, 0))
+
+    def test_post_review_updates_summary(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('post-review', args=[self.product.id]), {'rating': 4, 'comment': 'Nice'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.summary().star_4, 1)
+
+    def test_stats_is_single_row_read(self):
+        Review.objects.create(product=self.product, user_name=self.user, rating=4, comment="Good")
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['total_reviews'], 1)
+        self.assertEqual(response.data['recommended_percentage'], 100.0)
+
+    def test_rebuild_command(self):
+        Review.objects.create(product=self.product, user_name=self.user, rating=5, comment="Great")
+        Review.objects.create(product=self.product, user_name=self.other_user, rating=1, comment="Bad")
+        ProductRatingSummary.objects.all().delete()
+
+        call_command('rebuild_review_stats', stdout=StringIO())
+
+        summary = self.summary()
+        self.assertEqual((summary.review_count, summary.rating_sum, summary.star_5, summary.star_1), (2, 6, 1, 1))
+        self.assertEqual(summary.average_rating, 3.0)
+
+    def test_deleting_product_with_reviews(self):
+        Review.objects.create(product=self.product, user_name=self.user, rating=5, comment="Great")
+        self.product.delete()
+        self.assertFalse(ProductRatingSummary.objects.exists())
+
+
+class ReviewStatsForTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [User.objects.create_user(username=f'user{i}', password='password') for i in range(3)]
+        self.products = [
+            Product.objects.create(
+                category='Health',
+                name=f'Product {i}',
+                initial_price=100.00,
+                discounted_price=80.00,
+                description='Description',
+            )
+            for i in range(3)
+        ]
+        for user, rating in zip(self.users, [5, 4, 1]):
+            Review.objects.create(product=self.products[0], user_name=user, rating=rating, comment="")
+        Review.objects.create(product=self.products[1], user_name=self.users[0], rating=3, comment="")
+
+    def test_grouped_stats_in_one_query(self):
+        ids = [p.id for p in self.products]
+        with self.assertNumQueries(1):
+            stats = review_stats_for(ids)
+
+        self.assertEqual(stats[ids[0]]['total_reviews'], 3)
+        self.assertEqual(stats[ids[0]]['average_rating'], 3.3)
+        self.assertEqual(stats[ids[0]]['recommended_percentage'], 66.7)
+        self.assertEqual(stats[ids[0]]['star_counts'], {'1_star': 1, '2_star': 0, '3_star': 0, '4_star': 1, '5_star': 1})
+        self.assertEqual(stats[ids[1]]['star_counts']['3_star'], 1)
+        self.assertEqual(stats[ids[2]]['total_reviews'], 0)
+
+    def test_matches_denormalized_summary(self):
+        product = self.products[0]
+        summary = ProductRatingSummary.objects.get(product=product)
+        self.assertEqual(summary_review_stats(summary), review_stats_for([product.id])[product.id])
+
+    def test_stats_fall_back_without_summary(self):
+        ProductRatingSummary.objects.all().delete()
+        response = self.client.get(reverse('product-review-stats', args=[self.products[0].id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_reviews'], 3)
+
+    def test_batch_endpoint(self):
+        ids = ','.join(str(p.id) for p in self.products)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('product-review-stats-batch'), {'ids': ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[str(self.products[0].id)]['total_reviews'], 3)
+        self.assertEqual(response.data[str(self.products[2].id)]['average_rating'], 0)
+
+    def test_batch_endpoint_leaves_out_unknown_ids(self):
+        missing = self.products[-1].id + 100
+        response = self.client.get(reverse('product-review-stats-batch'), {'ids': f'{self.products[2].id},{missing}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {str(self.products[2].id)})
+
+    def test_batch_endpoint_rejects_bad_ids(self):
+        response = self.client.get(reverse('product-review-stats-batch'), {'ids': '1,abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
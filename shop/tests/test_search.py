@@ -0,0 +1,89 @@
+import unittest
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from shop.models import Product, Type
+from shop.search import search_products, search_terms
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+class SearchTermsTest(unittest.TestCase):
+    def test_operators_are_stripped(self):
+        self.assertEqual(search_terms('Whey "protein" OR -vanilla* _'), ['whey', 'protein', 'or', 'vanilla'])
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('product-search')
+        self.supplements = Type.objects.create(name='Supplements')
+        self.apparel = Type.objects.create(name='Apparel')
+        self.whey = self.create_product('Whey Protein', 'Vanilla flavoured protein powder', self.supplements, 'Health')
+        self.bar = self.create_product('Energy Bar', 'Contains protein and oats', self.supplements, 'Health')
+        self.shirt = self.create_product('Wolverine Shirt', 'Cotton training shirt', self.apparel, 'Merchandise')
+
+    def create_product(self, name, description, type, category):
+        return Product.objects.create(
+            category=category,
+            type=type,
+            name=name,
+            initial_price=100.00,
+            discounted_price=80.00,
+            description=description,
+        )
+
+    def search(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p['name'] for p in response.data['results']]
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search('wolv'), ['Wolverine Shirt'])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search('shirt cotton'), ['Wolverine Shirt'])
+        self.assertEqual(self.search('shirt vanilla'), [])
+
+    def test_type_and_category_are_searchable(self):
+        self.assertEqual(self.search('apparel'), ['Wolverine Shirt'])
+        self.assertCountEqual(self.search('health'), ['Whey Protein', 'Energy Bar'])
+
+    @unittest.skipIf(connection.vendor not in ('sqlite', 'postgresql'), "Needs a full-text backend")
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.search('protein'), ['Whey Protein', 'Energy Bar'])
+
+    def test_index_follows_product_and_type_changes(self):
+        self.shirt.name = 'Logan Tee'
+        self.shirt.save()
+        self.assertEqual(self.search('wolverine'), [])
+        self.assertEqual(self.search('logan'), ['Logan Tee'])
+
+        self.apparel.name = 'Clothing'
+        self.apparel.save()
+        self.assertEqual(self.search('clothing'), ['Logan Tee'])
+
+        self.shirt.delete()
+        self.assertEqual(self.search('logan'), [])
+
+    def test_operator_input_is_harmless(self):
+        self.assertEqual(self.search('"protein OR'), [])
+        self.assertEqual(self.search('***'), [])
+
+    @override_settings(PRODUCT_SEARCH_MAX_RESULTS=1)
+    def test_results_are_capped(self):
+        self.assertEqual(len(search_products('protein')), 1)
+
+    def test_empty_query(self):
+        response = self.client.get(self.url, {'q': '  '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PRODUCT_SEARCH_BACKEND='shop.search.LikeSearchBackend')
+    def test_like_backend(self):
+        self.assertEqual(self.search('wolv'), ['Wolverine Shirt'])
+
+    def test_rebuild_command(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('oats'), ['Energy Bar'])
@@ -0,0 +1,220 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import User
+from shop.models import Order, OrderItem, OutboundEmail, ProcessedStripeEvent, Product, UserSubscription
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+def checkout_completed(order, event_id='evt_1', **session):
+    return {
+        'id': event_id,
+        'type': 'checkout.session.completed',
+        'data': {'object': {'client_reference_id': str(order.id), **session}},
+    }
+
+
+def stripe_subscription(*price_ids):
+    return {'items': {'data': [
+        {'id': f'si_{i}', 'price': {'id': price_id}, 'quantity': 1}
+        for i, price_id in enumerate(price_ids)
+    ]}}
+
+
+@override_settings(STRIPE_WEBHOOK_BACKGROUND=False)
+@patch('shop.views.stripe.Webhook.construct_event')
+class StripeWebhookIdempotencyTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('stripe-webhook')
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='password')
+        self.product = Product.objects.create(
+            category='Health',
+            name='Protein',
+            initial_price=100.00,
+            discounted_price=100.00,
+            description='Description',
+            stripe_subscription_price_id='price_sub',
+        )
+        self.order = Order.objects.create(user=self.user, email='buyer@example.com', total_price=100, shipping_fee=0)
+        OrderItem.objects.create(order=self.order, product=self.product, price=100, quantity=1)
+
+    def deliver(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {}, format='json', HTTP_STRIPE_SIGNATURE='sig')
+
+    def test_webhook_acknowledges_before_side_effects(self, mock_construct_event):
+        mock_construct_event.return_value = checkout_completed(self.order)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.url, {}, format='json', HTTP_STRIPE_SIGNATURE='sig')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.is_paid)
+        self.assertEqual(ProcessedStripeEvent.objects.get().status, 'Received')
+        self.assertFalse(OutboundEmail.objects.exists())
+        self.assertEqual(len(callbacks), 1)
+
+    def test_retried_event_is_handled_once(self, mock_construct_event):
+        mock_construct_event.return_value = checkout_completed(self.order)
+
+        self.assertEqual(self.deliver().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.deliver().status_code, status.HTTP_200_OK)
+
+        event = ProcessedStripeEvent.objects.get()
+        self.assertEqual(event.status, 'Processed')
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    @patch('shop.payments.StripeGateway._retrieve_subscription')
+    def test_retried_subscription_event_creates_one_subscription(self, mock_retrieve, mock_construct_event):
+        mock_retrieve.return_value = stripe_subscription('price_sub')
+        mock_construct_event.return_value = checkout_completed(
+            self.order, mode='subscription', subscription='sub_1', customer_email='buyer@example.com'
+        )
+
+        self.deliver()
+        self.deliver()
+
+        self.assertEqual(UserSubscription.objects.filter(user=self.user, product=self.product).count(), 1)
+        mock_retrieve.assert_called_once_with('sub_1')
+
+    @patch('shop.payments.StripeGateway._retrieve_subscription')
+    def test_subscription_items_resolve_in_constant_queries(self, mock_retrieve, mock_construct_event):
+        for i in range(4):
+            Product.objects.create(
+                category='Health',
+                name=f'Plan {i}',
+                initial_price=10.00,
+                discounted_price=10.00,
+                description='Description',
+                stripe_subscription_price_id=f'price_{i}',
+            )
+
+        def deliver_subscription(event_id, subscription_id, price_ids):
+            mock_retrieve.return_value = stripe_subscription(*price_ids)
+            mock_construct_event.return_value = checkout_completed(
+                self.order, event_id=event_id, mode='subscription',
+                subscription=subscription_id, customer_email='buyer@example.com'
+            )
+            with CaptureQueriesContext(connection) as queries:
+                self.deliver()
+            return len(queries)
+
+        single = deliver_subscription('evt_a', 'sub_a', ['price_0'])
+        many = deliver_subscription('evt_b', 'sub_b', ['price_0', 'price_1', 'price_2', 'price_3', 'price_unknown'])
+
+        self.assertEqual(single, many)
+        self.assertEqual(UserSubscription.objects.filter(stripe_subscription_id='sub_b').count(), 4)
+
+    @patch('shop.payments.StripeGateway._retrieve_subscription')
+    def test_failed_event_is_processed_on_redelivery(self, mock_retrieve, mock_construct_event):
+        mock_retrieve.side_effect = Exception('Stripe unavailable')
+        mock_construct_event.return_value = checkout_completed(
+            self.order, mode='subscription', subscription='sub_1', customer_email='buyer@example.com'
+        )
+
+        self.deliver()
+        event = ProcessedStripeEvent.objects.get()
+        self.assertEqual(event.status, 'Failed')
+        self.assertEqual(event.last_error, 'Stripe unavailable')
+        self.assertFalse(OutboundEmail.objects.exists())
+
+        mock_retrieve.side_effect = None
+        mock_retrieve.return_value = stripe_subscription('price_sub')
+        self.deliver()
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'Processed')
+        self.assertEqual(event.attempts, 2)
+        self.assertEqual(UserSubscription.objects.count(), 1)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    @patch('shop.payments.StripeGateway._retrieve_subscription')
+    def test_failed_step_rolls_back_earlier_steps(self, mock_retrieve, mock_construct_event):
+        mock_retrieve.return_value = stripe_subscription('price_sub')
+        mock_construct_event.return_value = checkout_completed(
+            self.order, mode='subscription', subscription='sub_1', customer_email='buyer@example.com'
+        )
+
+        with patch('shop.webhooks.refresh_related', side_effect=Exception('boom')):
+            self.deliver()
+        self.assertEqual(ProcessedStripeEvent.objects.get().status, 'Failed')
+        self.assertFalse(UserSubscription.objects.exists())
+        self.assertFalse(OutboundEmail.objects.exists())
+
+        self.deliver()
+        self.assertEqual(ProcessedStripeEvent.objects.get().status, 'Processed')
+        self.assertEqual(UserSubscription.objects.count(), 1)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_replayed_event_does_not_reopen_shipped_order(self, mock_construct_event):
+        mock_construct_event.return_value = checkout_completed(self.order)
+        self.deliver()
+        Order.objects.filter(pk=self.order.pk).update(status='Shipped')
+
+        mock_construct_event.return_value = checkout_completed(self.order, event_id='evt_2')
+        self.deliver()
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'Shipped')
+
+
+class ReplayStripeEventsTest(TestCase):
+    def setUp(self):
+        self.order = Order.objects.create(email='guest@example.com', total_price=100, shipping_fee=0)
+        fd, self.fixture = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump([checkout_completed(self.order, 'evt_a'), checkout_completed(self.order, 'evt_b')], f)
+
+    def tearDown(self):
+        os.remove(self.fixture)
+
+    def replay(self, *args):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('replay_stripe_events', *args, stdout=out)
+        return out.getvalue()
+
+    def test_replay_fixture(self):
+        self.assertIn('Processed 2 events, 0 failed', self.replay(self.fixture))
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.is_paid)
+        self.assertEqual(OutboundEmail.objects.count(), 4)
+
+        # Already handled events are skipped unless forced
+        self.assertIn('Processed 0 events', self.replay(self.fixture))
+        self.assertIn('Processed 2 events', self.replay(self.fixture, '--force'))
+
+    def test_replay_pending_events(self):
+        ProcessedStripeEvent.objects.create(
+            event_id='evt_pending', type='checkout.session.completed', payload=checkout_completed(self.order, 'evt_pending')
+        )
+        self.assertIn('Processed 1 events', self.replay('--pending'))
+        self.assertEqual(ProcessedStripeEvent.objects.get().status, 'Processed')
+
+    def test_replay_reclaims_abandoned_events(self):
+        payload = checkout_completed(self.order, 'evt_stale')
+        ProcessedStripeEvent.objects.create(
+            event_id='evt_stale', type='checkout.session.completed', payload=payload,
+            status='Processing', claimed_at=timezone.now() - timedelta(hours=1),
+        )
+        ProcessedStripeEvent.objects.create(
+            event_id='evt_running', type='checkout.session.completed', payload=payload,
+            status='Processing', claimed_at=timezone.now(),
+        )
+        # The worker holding the fresh lease may still be running it
+        self.assertIn('Processed 1 events', self.replay('--pending'))
+        self.assertEqual(ProcessedStripeEvent.objects.get(pk='evt_stale').status, 'Processed')
+        self.assertEqual(ProcessedStripeEvent.objects.get(pk='evt_running').status, 'Processing')
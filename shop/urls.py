@@ -7,6 +7,7 @@ urlpatterns = [
     path('merchandise-products/', views.MerchandiseProductView.as_view(), name='merchandise-product-list'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
     path('products/<int:pk>/add-to-cart/', views.AddToCartView.as_view(), name='add-to-cart'),
+    path('products/<int:pk>/also-bought/', views.AlsoBoughtView.as_view(), name='product-also-bought'),
     path('cart/', views.CartView.as_view(), name='cart-view'),
     path('cart/remove/<int:pk>/', views.RemoveCartItemView.as_view(), name='remove-from-cart'),
     path('cart/items/increase/<int:pk>/', views.IncreaseCartItemQuantityView.as_view(), name='increase-cart-item'),
@@ -14,12 +15,17 @@ urlpatterns = [
     path('checkout/', views.CheckoutView.as_view(), name='checkout'),
     path('stripe/webhook/', views.StripeWebhookView.as_view(), name='stripe-webhook'),
     path('search/products/', views.SearchProductView.as_view(), name='product-search'),
+    path('search/products/autocomplete/', views.ProductAutocompleteView.as_view(), name='product-autocomplete'),
+    path('search/products/autocomplete/stats/', views.ProductAutocompleteStatsView.as_view(), name='product-autocomplete-stats'),
     path('orders/', views.OrderListView.as_view(), name='order-list'),
     path('orders/<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
     path('post/review/<int:pk>/', views.CreateReviewView.as_view(), name='post-review'),
     path('contact-message/', views.ContactMessageView.as_view(), name='contact-message'),
     path('filter/product/', views.TypeFilterView.as_view(), name='filter-products'),
+    path('catalog-cache/stats/', views.CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
+    path('payments/stats/', views.PaymentGatewayStatsView.as_view(), name='payment-gateway-stats'),
     path('products/<int:pk>/reviews/stats/', views.ProductReviewStatsView.as_view(), name='product-review-stats'),
+    path('products/reviews/stats/', views.ProductReviewStatsBatchView.as_view(), name='product-review-stats-batch'),
     path('orders/<int:pk>/cancel/', views.CancelOrderView.as_view(), name='cancel-order'),
     path('orders/<int:pk>/confirm-delivery/', views.ConfirmDeliveryView.as_view(), name='confirm-delivery'),
     path('recurring/product/', views.UserSubscriptionListView.as_view(), name='subscription-list'),
@@ -1,65 +1,86 @@
 from django.shortcuts import render
-from . models import CartItem, ContactMessage, Product, Review, Order, OrderItem, OrderAddress, Type, UserSubscription
-from django.contrib.auth.models import User
-from . serializers import CartItemSerializer, ProductSerializer, ReviewSerializer, OrderSerializer, TypeSerializer, UserSubscriptionSerializer, GuestCheckoutSerializer, AuthenticatedCheckoutSerializer
+from . models import CartItem, ContactMessage, Product, ProductImage, ProductRatingSummary, ProductRecommendation, RelatedProduct, Review, Order, OrderItem, OrderAddress, Type, UserSubscription
+from . serializers import CartItemSerializer, CartItemExpandedSerializer, ProductSerializer, ProductListSerializer, ReviewSerializer, OrderSerializer, OrderSummarySerializer, TypeSerializer, UserSubscriptionSerializer, GuestCheckoutSerializer, AuthenticatedCheckoutSerializer, CartBatchSerializer, CartVariantSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status, permissions
+from rest_framework import generics, status, permissions
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from django.conf import settings
 import requests
 import base64
+from types import SimpleNamespace
+import hashlib
 import decimal
-from django.db.models import Avg, Q
-from django.db import transaction
-from django.core.mail import send_mail
+from django.db.models import Count, Max, OuterRef, Prefetch, Q, Subquery, prefetch_related_objects
+from django.db import IntegrityError, transaction
 import stripe
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import etag
 from django.utils.decorators import method_decorator
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.http import HttpResponse
+from .cache import CACHE_HEADER, CatalogCacheMixin, catalog_cache_stats
+from .cart import CartSummary, add_to_cart, apply_cart_operations, cart_summary, change_quantity
+from .checkout import increment_order_counts, release_order
+from .reviews import review_stats_for, summary_review_stats
+from .search import search_products
+from .autocomplete import get_autocomplete_index
+from .home import get_home_feed, render_home_feed
+from .mail import queue_mail
+from .pagination import OrderCursorPagination
+from .payments import get_gateway
+from .webhooks import dispatch_event, mark_order_paid, record_event
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
 
 
-class HealthProductListView(APIView):
+class HealthProductListView(CatalogCacheMixin, generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
+    serializer_class = ProductListSerializer
 
-    def get(self, request):
-        product = Product.objects.filter(category ='Health')
-        serializer = ProductSerializer(product, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    def get_queryset(self):
+        return Product.objects.for_listing().filter(category='Health').order_by('id')
 
 
-class MerchandiseProductView(APIView):
+class MerchandiseProductView(CatalogCacheMixin, generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
+    serializer_class = ProductListSerializer
 
-    def get(self, request):
-        product = Product.objects.filter(category ='Merchandise')
-        serializer = ProductSerializer(product, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    def get_queryset(self):
+        return Product.objects.for_listing().filter(category='Merchandise').order_by('id')
 
 
-class ProductDetailView(APIView):
+class ProductDetailView(CatalogCacheMixin, APIView):
     permission_classes = [permissions.AllowAny]
     
     def get(self, request, pk):
-        try: 
-            product = Product.objects.get(pk=pk)
-        except Product.DoesNotExist:
+        # Three queries: the product and its precomputed related products in
+        # one, their images in a second, the product's reviews in a third
+        scores = RelatedProduct.objects.filter(product_id=pk)
+        products = Product.objects.select_related('type', 'rating_summary').prefetch_related(
+            Prefetch('images', queryset=ProductImage.objects.order_by('id')),
+        ).annotate(
+            related_score=Subquery(scores.filter(related_id=OuterRef('pk')).values('score')[:1]),
+        ).filter(Q(pk=pk) | Q(pk__in=scores.values('related_id')))
+
+        product = None
+        related_products = []
+        for candidate in products:
+            if candidate.pk == pk:
+                product = candidate
+            else:
+                related_products.append(candidate)
+        if product is None:
             return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        serializer = ProductSerializer(product)
-        
-        reviews = Review.objects.filter(product=product)
-        review_serializer = ReviewSerializer(reviews, many=True)
-        
-        related_products = Product.objects.filter(category=product.category).exclude(id=product.id)[:4]
-        related_serializer = ProductSerializer(related_products, many=True)
-        
-        data = serializer.data
-        data['reviews'] = review_serializer.data
-        data['related_products'] = related_serializer.data
+
+        prefetch_related_objects([product], Prefetch('reviews', queryset=Review.objects.select_related('user_name').order_by('id')))
+        related_products.sort(key=lambda related: (-related.related_score, related.pk))
+
+        data = ProductSerializer(product).data
+        data['related_products'] = ProductListSerializer(related_products, many=True).data
         
         return Response(data, status=status.HTTP_200_OK)
     
@@ -72,24 +93,23 @@ class AddToCartView(APIView):
         except Product.DoesNotExist:
             return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        quantity = int(request.data.get('quantity', 1))
+        try:
+            quantity = int(request.data.get('quantity', 1))
+        except (TypeError, ValueError):
+            return Response({"error": "Quantity must be a number"}, status=status.HTTP_400_BAD_REQUEST)
 
         if quantity < 1:
             return Response({"error": "Quantity must be at least 1"}, status=status.HTTP_400_BAD_REQUEST)
 
-        cart_item, created = CartItem.objects.get_or_create(
-            user=request.user,
-            product=product
-        )
-
-        if not created:
-            cart_item.quantity += quantity
-        else:
-            cart_item.quantity = quantity
+        variant = CartVariantSerializer(data=request.data)
+        if not variant.is_valid():
+            return Response(variant.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        cart_item.save()
+        # Adds to the matching size/colour line with a single UPDATE, or
+        # creates it
+        new_quantity = add_to_cart(request.user, product, quantity, **variant.validated_data)
 
-        return Response({"message": "Product added to cart"}, status=status.HTTP_200_OK)
+        return Response({"message": "Product added to cart", "quantity": new_quantity}, status=status.HTTP_200_OK)
 
 
 
@@ -97,24 +117,33 @@ class CartView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        cart_items = CartItem.objects.filter(user=request.user)
-        serializer = CartItemSerializer(cart_items, many=True)
-        
-        subtotal = sum(item.product.discounted_price * item.quantity for item in cart_items)
-        shipping_fee = decimal.Decimal('50.00') # Fixed shipping fee
-        total = subtotal + shipping_fee
-        
-        # Check if eligible for free T-shirt (subtotal <= 1500)
-        eligible_for_free_tshirt = subtotal >= decimal.Decimal('1500.00') and cart_items.exists()
+        # Totals come from one aggregate query; the lines are loaded once,
+        # with everything the serializer touches prefetched. Lines carry a
+        # compact product unless the client asks for ?expand=product.
+        if request.query_params.get('expand') == 'product':
+            cart = cart_summary(request.user, CartItem.objects.with_product_details())
+            serializer = CartItemExpandedSerializer(cart.items, many=True, context={'request': request})
+        else:
+            cart = cart_summary(request.user, CartItem.objects.with_products())
+            serializer = CartItemSerializer(cart.items, many=True, context={'request': request})
 
         return Response({
             'items': serializer.data,
-            'subtotal': subtotal,
-            'shipping_fee': shipping_fee,
-            'total': total,
-            'eligible_for_free_tshirt': eligible_for_free_tshirt
+            'subtotal': cart.subtotal,
+            'shipping_fee': cart.shipping_fee,
+            'total': cart.total,
+            'eligible_for_free_tshirt': cart.eligible_for_free_tshirt
         }, status=status.HTTP_200_OK)
     
+    def patch(self, request):
+        # A page of cart changes in one round trip; see shop.cart.apply_cart_operations
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        apply_cart_operations(request.user, serializer.validated_data['operations'])
+        return self.get(request)
+
     def delete(self, request):
         CartItem.objects.filter(user=request.user).delete()
         return Response({'message': 'Cleared cart'}, status=status.HTTP_200_OK)
@@ -137,32 +166,25 @@ class IncreaseCartItemQuantityView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            cart_item = CartItem.objects.get(user=request.user, pk=pk)
-        except CartItem.DoesNotExist:
+        quantity = change_quantity(CartItem.objects.filter(user=request.user, pk=pk), 1)
+        if quantity is None:
             return Response({'error': 'Cart item not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        cart_item.quantity += 1
-        cart_item.save()
-
-        return Response({'message': 'Quantity increased', 'quantity': cart_item.quantity}, status=status.HTTP_200_OK)
+        return Response({'message': 'Quantity increased', 'quantity': quantity}, status=status.HTTP_200_OK)
 
 
 class DecreaseCartItemQuantityView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            cart_item = CartItem.objects.get(user=request.user, pk=pk)
-        except CartItem.DoesNotExist:
-            return Response({'error': 'Cart item not found'}, status=status.HTTP_404_NOT_FOUND)
-
         # Prevent quantity from going below 1
-        if cart_item.quantity > 1:
-            cart_item.quantity -= 1
-            cart_item.save()
-            return Response({'message': 'Quantity decreased', 'quantity': cart_item.quantity}, status=status.HTTP_200_OK)
+        cart_item = CartItem.objects.filter(user=request.user, pk=pk)
+        quantity = change_quantity(cart_item, -1, quantity__gt=1)
+        if quantity is not None:
+            return Response({'message': 'Quantity decreased', 'quantity': quantity}, status=status.HTTP_200_OK)
 
+        if not cart_item.exists():
+            return Response({'error': 'Cart item not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response({'error': 'Quantity cannot be less than 1'}, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -186,139 +208,153 @@ class CheckoutView(APIView):
 
         # Prepare Cart Items and User
         if request.user and request.user.is_authenticated:
-            server_cart_qs = CartItem.objects.filter(user=request.user)
-            if not server_cart_qs.exists():
+            cart = cart_summary(request.user, CartItem.objects.with_products())
+            if not cart.items:
                 return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
-            cart_items = list(server_cart_qs) # Evaluate to list to avoid issues if QS is deleted later
             clear_server_cart = True
             order_user = request.user
             customer_email = request.user.email
         else:
-            # Guest User
-            cart_items_data = validated_data['cart_items']
-            from types import SimpleNamespace
-            built_items = []
-            try:
-                for ci in cart_items_data:
-                    product = Product.objects.get(pk=ci['product_id'])
-                    built_items.append(SimpleNamespace(product=product, quantity=ci['quantity']))
-            except Product.DoesNotExist:
-                return Response({"error": "One or more products in cart_items not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-            cart_items = built_items
+            # Guest User; GuestCheckoutSerializer already resolved the products
+            cart = CartSummary.from_lines([
+                SimpleNamespace(
+                    product=line['product'],
+                    quantity=line['quantity'],
+                    selected_size=None,
+                    selected_color_hex=None,
+                    selected_color_name=None,
+                )
+                for line in validated_data['cart_items']
+            ])
             clear_server_cart = False
             order_user = None
             customer_email = validated_data['email']
 
-        # Calculate totals
-        total_price = sum(item.product.discounted_price * item.quantity for item in cart_items)
-        shipping_fee = decimal.Decimal('50.00')
+        cart_items = cart.items
+        total_price = cart.subtotal
+        shipping_fee = cart.shipping_fee
 
         # Free T-shirt eligibility check
-        eligible_for_free_tshirt = total_price >= decimal.Decimal('1500.00')
+        eligible_for_free_tshirt = cart.eligible_for_free_tshirt
         if eligible_for_free_tshirt:
             if not free_tshirt_size:
                  return Response({"error": "You are eligible for a free T-shirt! Please select your T-shirt size (S, L, M, XL, XXL)."}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            with transaction.atomic():
-                order = Order.objects.create(
-                    user=order_user,
-                    email=customer_email,
-                    total_price=total_price,
-                    shipping_fee=shipping_fee,
-                    status='Pending',
-                    is_paid=False
-                )
+        # Phase 1: persist the pending order and commit straight away, so no
+        # write transaction stays open while Stripe is called
+        with transaction.atomic():
+            order = Order.objects.create(
+                user=order_user,
+                email=customer_email,
+                total_price=total_price,
+                shipping_fee=shipping_fee,
+                status='Pending',
+                is_paid=False
+            )
 
-                OrderAddress.objects.create(
-                    order=order,
-                    name=address_data['name'],
-                    phone=address_data['phone'],
-                    address=address_data['address'],
-                    type=address_data['type']
-                )
+            OrderAddress.objects.create(
+                order=order,
+                name=address_data['name'],
+                phone=address_data['phone'],
+                address=address_data['address'],
+                type=address_data['type']
+            )
 
-                for item in cart_items:
-                    OrderItem.objects.create(
-                        order=order,
-                        product=item.product,
-                        price=item.product.discounted_price,
-                        quantity=item.quantity
-                    )
-                    item.product.order_count += item.quantity
-                    item.product.save(update_fields=['order_count'])
-
-                if eligible_for_free_tshirt:
-                    OrderItem.objects.create(
-                        order=order,
-                        product=None,
-                        price=decimal.Decimal('0.00'),
-                        quantity=1,
-                        is_free_item=True,
-                        free_item_size=free_tshirt_size
-                    )
-
-                # Prepare Stripe line items
-                line_items = []
-                mode = 'subscription' if is_subscription else 'payment'
-
-                for item in cart_items:
-                    if is_subscription:
-                        price_id = getattr(item.product, 'stripe_subscription_price_id', None)
-                    else:
-                        # Force use of price_data (AUD) for one-time payments to avoid currency mismatch
-                        # if the database has USD price IDs.
-                        price_id = None
-
-                    if price_id:
-                        line_items.append({'price': price_id, 'quantity': item.quantity})
-                    else:
-                        line_items.append({
-                            'price_data': {
-                                'currency': 'aud',
-                                'product_data': {'name': item.product.name},
-                                'unit_amount': int(item.product.discounted_price * 100),
-                            },
-                            'quantity': item.quantity,
-                        })
-
-                if mode == 'payment':
-                    line_items.append({
-                        'price_data': {
-                            'currency': 'aud',
-                            'product_data': {'name': 'Shipping Fee'},
-                            'unit_amount': int(shipping_fee * 100),
-                        },
-                        'quantity': 1,
-                    })
-
-                frontend_url = settings.FRONTEND_URL
-
-                checkout_session = stripe.checkout.Session.create(
-                    payment_method_types=['card'],
-                    line_items=line_items,
-                    mode=mode,
-                    success_url=frontend_url + settings.STRIPE_SUCCESS_URL,
-                    cancel_url=frontend_url + settings.STRIPE_CANCEL_URL,
-                    client_reference_id=str(order.id),
-                    customer_email=customer_email,
-                    metadata={'order_id': order.id}
+            # Each line keeps a snapshot of the product as sold
+            order_items = [
+                OrderItem.from_product(
+                    order,
+                    item.product,
+                    item.quantity,
+                    size=item.selected_size,
+                    color_hex=item.selected_color_hex,
+                    color_name=item.selected_color_name,
                 )
+                for item in cart_items
+            ]
 
-                order.stripe_checkout_session_id = checkout_session.id
-                order.save()
-
-                # Clear server cart only for authenticated users
-                if clear_server_cart and request.user and request.user.is_authenticated:
-                    CartItem.objects.filter(user=request.user).delete()
+            if eligible_for_free_tshirt:
+                order_items.append(OrderItem(
+                    order=order,
+                    product=None,
+                    product_name='Free T-shirt',
+                    price=decimal.Decimal('0.00'),
+                    quantity=1,
+                    is_free_item=True,
+                    free_item_size=free_tshirt_size
+                ))
+
+            OrderItem.objects.bulk_create(order_items)
+            increment_order_counts(cart_items)
+
+        # Prepare Stripe line items
+        line_items = []
+        mode = 'subscription' if is_subscription else 'payment'
+
+        for item in cart_items:
+            if is_subscription:
+                price_id = getattr(item.product, 'stripe_subscription_price_id', None)
+            else:
+                # Force use of price_data (AUD) for one-time payments to avoid currency mismatch
+                # if the database has USD price IDs.
+                price_id = None
+
+            if price_id:
+                line_items.append({'price': price_id, 'quantity': item.quantity})
+            else:
+                line_items.append({
+                    'price_data': {
+                        'currency': 'aud',
+                        'product_data': {'name': item.product.name},
+                        'unit_amount': int(item.product.discounted_price * 100),
+                    },
+                    'quantity': item.quantity,
+                })
+
+        if mode == 'payment':
+            line_items.append({
+                'price_data': {
+                    'currency': 'aud',
+                    'product_data': {'name': 'Shipping Fee'},
+                    'unit_amount': int(shipping_fee * 100),
+                },
+                'quantity': 1,
+            })
 
-                serializer = OrderSerializer(order)
-                return Response({'order': serializer.data, 'checkout_url': checkout_session.url}, status=status.HTTP_201_CREATED)
+        frontend_url = settings.FRONTEND_URL
 
+        # Phase 2: the Stripe round trip, outside any transaction
+        try:
+            checkout_session = get_gateway().create_checkout_session(
+                payment_method_types=['card'],
+                line_items=line_items,
+                mode=mode,
+                success_url=frontend_url + settings.STRIPE_SUCCESS_URL,
+                cancel_url=frontend_url + settings.STRIPE_CANCEL_URL,
+                client_reference_id=str(order.id),
+                customer_email=customer_email,
+                metadata={'order_id': order.id}
+            )
         except Exception as e:
+            # The customer never got a checkout URL, so drop the order again
+            release_order(order, delete=True)
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Phase 3: attach the session and clear the cart in a short write.
+        # Orders left without a session are picked up by reconcile_checkouts.
+        with transaction.atomic():
+            Order.objects.filter(pk=order.pk).update(
+                stripe_checkout_session_id=checkout_session.id,
+                updated_at=timezone.now(),
+            )
+
+            # Clear server cart only for authenticated users
+            if clear_server_cart and request.user and request.user.is_authenticated:
+                CartItem.objects.filter(user=request.user).delete()
+
+        serializer = OrderSerializer(Order.objects.with_items().get(pk=order.pk))
+        return Response({'order': serializer.data, 'checkout_url': checkout_session.url}, status=status.HTTP_201_CREATED)
+
 
 @method_decorator(csrf_exempt, name='dispatch')
 class StripeWebhookView(APIView):
@@ -338,71 +374,17 @@ class StripeWebhookView(APIView):
         except stripe.error.SignatureVerificationError as e:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        if event['type'] == 'checkout.session.completed':
-            session = event['data']['object']
-            order_id = session.get('client_reference_id')
-            
-            if order_id:
-                try:
-                    order = Order.objects.get(id=order_id)
-                    order.is_paid = True
-                    order.status = 'Processing'
-                    order.save()
-                    # Send confirmation email to customer and notification to admin
-                    try:
-                        customer_email = order.email
-                        from_email = settings.DEFAULT_FROM_EMAIL
-
-                        # Build order summary
-                        items = order.items.all()
-                        lines = [f"Thank you for your order #{order.id}."]
-                        lines.append(f"Total: {order.total_price}")
-                        lines.append("Items:")
-                        for it in items:
-                            prod_name = it.product.name if it.product else 'Free item'
-                            lines.append(f"- {prod_name} x{it.quantity} @ {it.price}")
-                        lines.append(f"Shipping Fee: {order.shipping_fee}")
-                        lines.append(f"Status: {order.status}")
-                        body = "\n".join(lines)
-
-                        subject = f"Order Confirmation - Order #{order.id}"
-                        send_mail(subject, body, from_email, [customer_email], fail_silently=True)
-
-                        admin_email = getattr(settings, 'ADMIN_EMAIL', None) or from_email
-                        admin_subject = f"New Order Paid - #{order.id}"
-                        admin_body = f"Order {order.id} has been paid by {customer_email}.\n\n" + body
-                        send_mail(admin_subject, admin_body, from_email, [admin_email], fail_silently=True)
-                    except Exception as e:
-                        print(f"Error sending order confirmation emails: {e}")
-                except Order.DoesNotExist:
-                    pass
-
-            # Handle Subscription Creation
-            if session.get('mode') == 'subscription':
-                subscription_id = session.get('subscription')
-                user_email = session.get('customer_email')
-                
-                try:
-                    user = User.objects.get(email=user_email)
-                    # Retrieve subscription details from Stripe to get items
-                    stripe_subscription = stripe.Subscription.retrieve(subscription_id)
-                    
-                    for item in stripe_subscription['items']['data']:
-                        price_id = item['price']['id']
-                        # Find product by price_id
-                        product = Product.objects.filter(stripe_subscription_price_id=price_id).first()
-                        
-                        if product:
-                            UserSubscription.objects.create(
-                                user=user,
-                                product=product,
-                                stripe_subscription_id=subscription_id,
-                                stripe_subscription_item_id=item['id'],
-                                quantity=item['quantity'],
-                                status='Active'
-                            )
-                except Exception as e:
-                    print(f"Error processing subscription webhook: {e}")
+        record = record_event(event, payload)
+        if record is None:
+            # Duplicate delivery; the first one is (being) handled
+            return Response(status=status.HTTP_200_OK)
+
+        if record.type == 'checkout.session.completed':
+            # The one write the customer waits on happens before acknowledging
+            mark_order_paid(record.payload['data']['object'])
+
+        # Emails, Stripe lookups and subscriptions run after the response
+        transaction.on_commit(lambda: dispatch_event(record.event_id))
         
         return Response(status=status.HTTP_200_OK)
 
@@ -411,25 +393,52 @@ class StripeWebhookView(APIView):
 
 
 
-class OrderListView(APIView):
+def order_list_etag(request, *args, **kwargs):
+    # One aggregate query; any new order or status change moves count or updated_at
+    state = Order.objects.filter(user=request.user).aggregate(count=Count('id'), last_updated=Max('updated_at'))
+    last_updated = state['last_updated'].isoformat() if state['last_updated'] else ''
+    return hashlib.md5(f"{request.user.pk}:{state['count']}:{last_updated}:{request.get_full_path()}".encode()).hexdigest()
+
+
+def order_detail_etag(request, pk, *args, **kwargs):
+    last_updated = Order.objects.filter(pk=pk, user=request.user).values_list('updated_at', flat=True).first()
+    if last_updated is None:
+        return None
+    return hashlib.md5(f"{request.user.pk}:{pk}:{last_updated.isoformat()}".encode()).hexdigest()
+
+
+class OrderListView(generics.ListAPIView):
+    # Newest first, a cursor page at a time; ?view=summary drops the line
+    # details for a compact history row per order
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
 
-    def get(self, request):
-        orders = Order.objects.filter(user=request.user).order_by('-created_at')
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    def summary_requested(self):
+        return self.request.query_params.get('view') == 'summary'
+
+    def get_queryset(self):
+        orders = Order.objects.filter(user=self.request.user)
+        return orders.for_summary() if self.summary_requested() else orders.with_items()
+
+    def get_serializer_class(self):
+        return OrderSummarySerializer if self.summary_requested() else OrderSerializer
+
+    @method_decorator(etag(order_list_etag))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 
 class OrderDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @method_decorator(etag(order_detail_etag))
     def get(self, request, pk):
         try:
-            order = Order.objects.get(pk=pk, user=request.user)
+            order = Order.objects.with_items().get(pk=pk, user=request.user)
         except Order.DoesNotExist:
             return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        serializer = OrderSerializer(order)
+        serializer = OrderSerializer(order, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -464,13 +473,20 @@ class CreateReviewView(APIView):
             return Response({"error": "You have already posted a review for this product."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # Create review
-        review = Review.objects.create(
-            product=product,
-            user_name=request.user,
-            rating=rating,
-            comment=comment
-        )
+        # Create review; shop.signals updates the product's rating summary in
+        # the same transaction
+        try:
+            with transaction.atomic():
+                review = Review.objects.create(
+                    product=product,
+                    user_name=request.user,
+                    rating=rating,
+                    comment=comment
+                )
+        except IntegrityError:
+            # Lost a race with a concurrent post by the same user
+            return Response({"error": "You have already posted a review for this product."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
         serializer = ReviewSerializer(review)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -493,11 +509,11 @@ class ContactMessageView(APIView):
         else:
             user = None
         
-        # Send email to admin
+        # Queue email to admin
 
-        send_mail(
+        queue_mail(
             subject='New Contact Message Received',
-            message=f"""
+            body=f"""
                 Name: {name}
                 Email: {email}
                 WhatsApp: {whatsapp}
@@ -505,9 +521,7 @@ class ContactMessageView(APIView):
                 Project Details:
                 {project_details}
                             """,
-                            from_email=settings.DEFAULT_FROM_EMAIL,
-                            recipient_list=[settings.ADMIN_EMAIL],
-                            fail_silently=False,
+                            recipients=[settings.ADMIN_EMAIL],
                         )
         
         
@@ -524,37 +538,75 @@ class ContactMessageView(APIView):
 
 
 class HomePageView(APIView):
+    # Served from the pre-rendered feed in shop.home; no ORM queries unless
+    # the cache is cold. X-Catalog-Cache: bypass renders it live instead.
+    # Tokens are checked from their claims alone, so signed-in users get
+    # their own throttle without a user lookup.
     permission_classes = [permissions.AllowAny]
+    authentication_classes = [JWTStatelessUserAuthentication]
 
     def get(self, request):
-        products = Product.objects.all().order_by(
-            '-order_count', 
-            '-created_at',
-            )[:4]
-        
-        reviews = Review.objects.all().order_by('-rating')[:20]
-        
-        data = {
-            'products': ProductSerializer(products, many=True).data,
-            'reviews': ReviewSerializer(reviews, many=True).data
-        }
-
-        return Response(data, status=status.HTTP_200_OK)
+        if request.headers.get(CACHE_HEADER, '').lower() == 'bypass':
+            feed, state = render_home_feed(), 'BYPASS'
+        else:
+            feed, cached = get_home_feed()
+            state = 'HIT' if cached else 'MISS'
+
+        not_modified = get_conditional_response(request, etag=feed['etag'])
+        if not_modified is not None:
+            not_modified['ETag'] = feed['etag']
+            return not_modified
+
+        response = HttpResponse(feed['body'], content_type='application/json')
+        response['ETag'] = feed['etag']
+        response[CACHE_HEADER] = state
+        return response
     
 
-class TypeFilterView(APIView):
-    permission_classes = [permissions.AllowAny]
+class CatalogCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        type_id = request.query_params.get('type')
+        return Response(catalog_cache_stats(), status=status.HTTP_200_OK)
+
+
+class PaymentGatewayStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        gateway = get_gateway()
+        return Response({'gateway': gateway.name, 'operations': gateway.metrics.snapshot()}, status=status.HTTP_200_OK)
+
 
-        products = Product.objects.all()
+class TypeFilterView(CatalogCacheMixin, generics.ListAPIView):
+    permission_classes = [permissions.AllowAny]
+    serializer_class = ProductListSerializer
+
+    def get_queryset(self):
+        type_id = self.request.query_params.get('type')
+
+        products = Product.objects.for_listing().order_by('id')
 
         if type_id:
             products = products.filter(type_id=type_id)
 
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return products
+
+
+class AlsoBoughtView(CatalogCacheMixin, APIView):
+    # "Customers also bought", precomputed by shop.recommendations
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk):
+        recommendations = ProductRecommendation.objects.filter(product_id=pk)
+        products = Product.objects.for_listing().annotate(
+            recommendation_score=Subquery(recommendations.filter(recommended_id=OuterRef('pk')).values('score')[:1]),
+        ).filter(pk__in=recommendations.values('recommended_id'))
+        products = sorted(products, key=lambda product: (-product.recommendation_score, product.pk))
+        # Only an empty list costs the extra existence check
+        if not products and not Product.objects.filter(pk=pk).exists():
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ProductListSerializer(products, many=True).data, status=status.HTTP_200_OK)
 
 
 class ProductReviewStatsView(APIView):
@@ -562,52 +614,35 @@ class ProductReviewStatsView(APIView):
 
     def get(self, request, pk):
         try:
-            product = Product.objects.get(pk=pk)
-        except Product.DoesNotExist:
-            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+            summary = ProductRatingSummary.objects.get(product_id=pk)
+        except ProductRatingSummary.DoesNotExist:
+            # No denormalized row yet (e.g. before rebuild_review_stats ran)
+            stats = review_stats_for([pk])
+            if pk not in stats:
+                return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+            return Response(stats[pk], status=status.HTTP_200_OK)
 
-        reviews = Review.objects.filter(product=product)
-        total_reviews = reviews.count()
-
-        if total_reviews == 0:
-            return Response({
-                "total_reviews": 0,
-                "average_rating": 0,
-                "star_counts": {
-                    "1_star": 0,
-                    "2_star": 0,
-                    "3_star": 0,
-                    "4_star": 0,
-                    "5_star": 0
-                },
-                "recommended_percentage": 0
-            }, status=status.HTTP_200_OK)
-
-        star_counts = {
-            "1_star": reviews.filter(rating=1).count(),
-            "2_star": reviews.filter(rating=2).count(),
-            "3_star": reviews.filter(rating=3).count(),
-            "4_star": reviews.filter(rating=4).count(),
-            "5_star": reviews.filter(rating=5).count(),
-        }
-
-        average_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-        # Round to 1 decimal place
-        average_rating = round(average_rating, 1) if average_rating else 0
-
-        # Assuming recommended means rating >= 4
-        recommended_count = reviews.filter(rating__gte=4).count()
-        recommended_percentage = (recommended_count / total_reviews) * 100 if total_reviews > 0 else 0
-        recommended_percentage = round(recommended_percentage, 1)
-
-        data = {
-            "total_reviews": total_reviews,
-            "average_rating": average_rating,
-            "star_counts": star_counts,
-            "recommended_percentage": recommended_percentage
-        }
+        return Response(summary_review_stats(summary), status=status.HTTP_200_OK)
 
-        return Response(data, status=status.HTTP_200_OK)
+
+class ProductReviewStatsBatchView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        try:
+            product_ids = [int(i) for i in request.query_params.get('ids', '').split(',') if i.strip()]
+        except ValueError:
+            return Response({"error": "ids must be a comma separated list of product IDs"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not product_ids:
+            return Response({"error": "ids is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(product_ids) > settings.REST_FRAMEWORK['PAGE_SIZE']:
+            return Response({"error": "Too many product IDs"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Unknown ids are left out rather than reported as unreviewed products
+        stats = review_stats_for(product_ids)
+        return Response({str(product_id): data for product_id, data in stats.items()}, status=status.HTTP_200_OK)
 
 
 
@@ -677,7 +712,7 @@ class UserSubscriptionUpdateView(APIView):
         try:
             # Update Stripe subscription item
             if subscription.stripe_subscription_item_id:
-                stripe.SubscriptionItem.modify(
+                get_gateway().modify_subscription_item(
                     subscription.stripe_subscription_item_id,
                     quantity=new_quantity
                 )
@@ -707,7 +742,7 @@ class UserSubscriptionDeleteView(APIView):
         try:
             # Cancel Stripe Subscription Item
             if subscription.stripe_subscription_item_id:
-                stripe.SubscriptionItem.delete(subscription.stripe_subscription_item_id)
+                get_gateway().delete_subscription_item(subscription.stripe_subscription_item_id)
 
             subscription.status = 'Cancelled'
             subscription.save()
@@ -719,28 +754,46 @@ class UserSubscriptionDeleteView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
 
-class SearchProductView(APIView):
+class SearchProductView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
+    serializer_class = ProductListSerializer
 
     def get(self, request):
         query = request.query_params.get('q', '')
 
-        if not query:
+        if not query.strip():
             return Response({"error": "Search query is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Split query into terms and require that each term matches at least
-        # one of the searchable fields (name, type name, or category).
-        terms = [t.strip() for t in query.split() if t.strip()]
+        # Ranked IDs from the full-text index (see shop.search), capped at
+        # PRODUCT_SEARCH_MAX_RESULTS
+        product_ids = search_products(query)
+        products_by_id = Product.objects.for_listing().in_bulk(product_ids)
+        products = [products_by_id[pk] for pk in product_ids if pk in products_by_id]
 
-        if not terms:
-            return Response({"error": "Search query is required"}, status=status.HTTP_400_BAD_REQUEST)
+        page = self.paginate_queryset(products)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class ProductAutocompleteView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
 
-        combined_q = Q()
-        for term in terms:
-            term_q = Q(name__icontains=term) | Q(type__name__icontains=term) | Q(category__icontains=term)
-            combined_q &= term_q
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 25))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
-        products = Product.objects.filter(combined_q).distinct()
-        serializer = ProductSerializer(products, many=True)
+        # Served from the in-process index; no database access unless the
+        # catalog changed since the index was built
+        results = get_autocomplete_index().lookup(query, limit=limit)
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+
+class ProductAutocompleteStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_autocomplete_index().stats(), status=status.HTTP_200_OK)
@@ -0,0 +1,228 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.contrib.auth.models import User
+from .mail import queue_mail
+from .models import Order, ProcessedStripeEvent, Product, UserSubscription
+from .payments import get_gateway
+from .related import refresh_order_related_products
+
+# Stripe delivers webhooks at least once. Every event is recorded in
+# ProcessedStripeEvent before anything else happens, so a retried delivery
+# hits the primary key and is acknowledged without being handled twice.
+# The webhook itself only marks the order paid; emails and subscription
+# setup run afterwards on a background thread (or inline when
+# STRIPE_WEBHOOK_BACKGROUND is off, as in tests). Stripe has already been
+# answered by then and will not redeliver, so a failed event is retried by
+# replay_stripe_events --pending (run it with --interval to do so
+# continuously). A worker that dies mid-event leaves the row Processing;
+# once its lease has run out the row counts as pending again.
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='stripe-events')
+
+
+def event_lease():
+    return getattr(settings, 'STRIPE_EVENT_LEASE', timedelta(minutes=10))
+
+
+def claimable(now=None):
+    """Events waiting to run, including ones abandoned by a dead worker."""
+    now = now or timezone.now()
+    return Q(status__in=['Received', 'Failed']) | Q(status='Processing', claimed_at__lt=now - event_lease())
+
+
+def pending_events(max_attempts=None):
+    events = ProcessedStripeEvent.objects.filter(claimable()).order_by('received_at')
+    if max_attempts is not None:
+        # Give up on events that keep failing; they stay Failed for a manual replay
+        events = events.exclude(status='Failed', attempts__gte=max_attempts)
+    return events
+
+
+def event_to_dict(event):
+    if isinstance(event, dict):
+        return event
+    return event.to_dict()
+
+
+def event_id_for(event, payload=None):
+    # Real events always carry an ID; fall back to the payload digest
+    if event.get('id'):
+        return event['id']
+    payload = payload or json.dumps(event, sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def record_event(event, payload=None):
+    """Insert the event row first; returns None when it was already recorded."""
+    event = event_to_dict(event)
+    event_id = event_id_for(event, payload)
+    try:
+        with transaction.atomic():
+            return ProcessedStripeEvent.objects.create(
+                event_id=event_id,
+                type=event.get('type', ''),
+                payload=json.loads(json.dumps(event, default=str)),
+            )
+    except IntegrityError:
+        # Let a retry through when the earlier attempt failed or was abandoned
+        now = timezone.now()
+        stale = Q(status='Failed') | Q(status='Processing', claimed_at__lt=now - event_lease())
+        if ProcessedStripeEvent.objects.filter(stale, pk=event_id).update(status='Received'):
+            return ProcessedStripeEvent.objects.get(pk=event_id)
+        return None
+
+
+def mark_order_paid(session):
+    order_id = session.get('client_reference_id')
+    if not order_id:
+        return 0
+    # Conditional so a replay cannot drag a shipped order back to Processing
+    try:
+        return Order.objects.filter(pk=order_id, is_paid=False).update(
+            is_paid=True, status='Processing', updated_at=timezone.now()
+        )
+    except ValueError:
+        return 0
+
+
+def send_order_emails(session):
+    order_id = session.get('client_reference_id')
+    if not order_id:
+        return
+    try:
+        order = Order.objects.get(pk=order_id)
+    except (Order.DoesNotExist, ValueError):
+        return
+
+    customer_email = order.email
+    from_email = settings.DEFAULT_FROM_EMAIL
+
+    # Build order summary
+    items = order.items.all()
+    lines = [f"Thank you for your order #{order.id}."]
+    lines.append(f"Total: {order.total_price}")
+    lines.append("Items:")
+    for it in items:
+        prod_name = it.product_name or 'Free item'
+        lines.append(f"- {prod_name} x{it.quantity} @ {it.price}")
+    lines.append(f"Shipping Fee: {order.shipping_fee}")
+    lines.append(f"Status: {order.status}")
+    body = "\n".join(lines)
+
+    subject = f"Order Confirmation - Order #{order.id}"
+    queue_mail(subject, body, [customer_email], from_email)
+
+    admin_email = getattr(settings, 'ADMIN_EMAIL', None) or from_email
+    admin_subject = f"New Order Paid - #{order.id}"
+    admin_body = f"Order {order.id} has been paid by {customer_email}.\n\n" + body
+    queue_mail(admin_subject, admin_body, [admin_email], from_email)
+
+
+def products_by_subscription_price(price_ids):
+    # One query for every item; the lowest id wins if a price is shared,
+    # matching the old per-item .first()
+    products = {}
+    for product in Product.objects.filter(stripe_subscription_price_id__in=set(price_ids)).order_by('-id'):
+        products[product.stripe_subscription_price_id] = product
+    return products
+
+
+def create_subscriptions(session):
+    if session.get('mode') != 'subscription':
+        return
+    subscription_id = session.get('subscription')
+    user_email = session.get('customer_email')
+
+    user = User.objects.filter(email=user_email).first()
+    if user is None or UserSubscription.objects.filter(stripe_subscription_id=subscription_id).exists():
+        return
+
+    # Retrieve subscription details from Stripe to get items
+    stripe_subscription = get_gateway().retrieve_subscription(subscription_id)
+    items = stripe_subscription['items']['data']
+    products = products_by_subscription_price([item['price']['id'] for item in items])
+
+    UserSubscription.objects.bulk_create([
+        UserSubscription(
+            user=user,
+            product=products[item['price']['id']],
+            stripe_subscription_id=subscription_id,
+            stripe_subscription_item_id=item['id'],
+            quantity=item['quantity'],
+            status='Active'
+        )
+        for item in items
+        if item['price']['id'] in products
+    ])
+
+
+def refresh_related(session):
+    # The paid order adds co-purchases for its products only. Runs after
+    # commit and is not part of the event: a failure here must not roll back
+    # or hold up the order emails, and the next refresh or rebuild redoes it.
+    try:
+        order_id = int(session.get('client_reference_id'))
+    except (TypeError, ValueError):
+        return
+    transaction.on_commit(lambda: refresh_order_related_products(order_id), robust=True)
+
+
+def handle_checkout_session_completed(session):
+    # Runs inside process_event's transaction, so a failed step undoes the
+    # earlier ones (queued emails included) and a retry starts clean. The
+    # Stripe call goes first, before this transaction has written anything.
+    create_subscriptions(session)
+    mark_order_paid(session)
+    send_order_emails(session)
+    refresh_related(session)
+
+
+EVENT_HANDLERS = {
+    'checkout.session.completed': handle_checkout_session_completed,
+}
+
+
+def process_event(event_id):
+    # Claim the row so two workers never handle the same event
+    now = timezone.now()
+    claimed = ProcessedStripeEvent.objects.filter(claimable(now), pk=event_id).update(
+        status='Processing', claimed_at=now, attempts=F('attempts') + 1
+    )
+    if not claimed:
+        return False
+
+    record = ProcessedStripeEvent.objects.get(pk=event_id)
+    handler = EVENT_HANDLERS.get(record.type)
+    try:
+        with transaction.atomic():
+            if handler:
+                handler(record.payload['data']['object'])
+            ProcessedStripeEvent.objects.filter(pk=event_id).update(
+                status='Processed', processed_at=timezone.now(), claimed_at=None, last_error=''
+            )
+    except Exception as e:
+        ProcessedStripeEvent.objects.filter(pk=event_id).update(
+            status='Failed', claimed_at=None, last_error=str(e)
+        )
+        return False
+    return True
+
+
+def _process_in_background(event_id):
+    try:
+        process_event(event_id)
+    finally:
+        close_old_connections()
+
+
+def dispatch_event(event_id):
+    if getattr(settings, 'STRIPE_WEBHOOK_BACKGROUND', True):
+        _executor.submit(_process_in_background, event_id)
+    else:
+        process_event(event_id)